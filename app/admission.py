@@ -0,0 +1,129 @@
+import asyncio
+from collections import deque
+
+from config import settings
+
+
+class Overloaded(Exception):
+    """No slot could be reserved: the wait queue is full or the wait timed out."""
+
+    def __init__(self, gate: str, reason: str):
+        super().__init__(f"{gate}: {reason}")
+        self.gate = gate
+        self.reason = reason
+
+
+class Ticket:
+    """A reserved slot. release() is idempotent so every exit path can call it."""
+
+    def __init__(self, gate: "Gate"):
+        self._gate = gate
+        self.gate = gate.name
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._gate._release()
+
+
+class Gate:
+    """
+    Bounded concurrency for one route with a short FIFO wait queue.
+    Requests beyond `limit` wait up to `max_wait` seconds for a slot; once
+    `queue_size` requests are already waiting, new ones are rejected at once.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.peak_active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0}
+
+    async def acquire(self) -> Ticket:
+        if self.active < self.limit and not self._waiters:
+            return self._grant()
+
+        if len(self._waiters) >= self.queue_size:
+            self.stats["rejected_full"] += 1
+            raise Overloaded(self.name, "queue full")
+
+        self.stats["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # Client went away while queued; hand back a slot we may have been given
+            if waiter.done():
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            self.stats["rejected_timeout"] += 1
+            raise Overloaded(self.name, "wait deadline exceeded")
+        # _release() already transferred its slot to us
+        self.stats["admitted"] += 1
+        return Ticket(self)
+
+    def _grant(self) -> Ticket:
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        self.stats["admitted"] += 1
+        return Ticket(self)
+
+    def _release(self) -> None:
+        # Pass the slot straight to the oldest waiter, if any
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "peak_active": self.peak_active,
+            **self.stats,
+        }
+
+
+class AdmissionController:
+    """
+    One gate per route, plus a separate `cheap` gate for requests that will
+    not call the LLM (direct FAQ answers, cached SQL pages, canned replies).
+    With ADMISSION_PRIORITIZE_CHEAP, those never queue behind expensive work.
+    """
+
+    CHEAP = "cheap"
+
+    def __init__(self):
+        self.gates: dict[str, Gate] = {}
+
+    def _gate(self, name: str) -> Gate:
+        if name not in self.gates:
+            limit = settings.ADMISSION_LIMITS.get(name, settings.ADMISSION_DEFAULT_LIMIT)
+            self.gates[name] = Gate(
+                name, limit, settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_MAX_WAIT
+            )
+        return self.gates[name]
+
+    async def acquire(self, route: str, cheap: bool = False) -> Ticket:
+        name = self.CHEAP if cheap and settings.ADMISSION_PRIORITIZE_CHEAP else route
+        return await self._gate(name).acquire()
+
+    def snapshot(self) -> dict:
+        return {name: gate.snapshot() for name, gate in self.gates.items()}
+
+
+admission = AdmissionController()
@@ -1,24 +1,36 @@
+import os
 import time
 import sqlite3
 import logging
+import pandas as pd
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
+from admission import Overloaded, Ticket, admission
+from catalog_stats import build_catalog_stats, catalog_stats_counters
+from config import settings
 from faq import (
-    faq_chain, faq_chain_stream, ingest_faq_data,
+    faq_chain, faq_chain_stream, ingest_faq_data, refresh_faq_index,
     general_llm_fallback, general_llm_fallback_stream,
-    chroma_client, collection_name_faq,
+    chroma_client, collection_name_faq, faq_stats,
+    get_relevant_qa, direct_answer,
 )
 from router import router
-from sql import sql_chain
+from llm import LLMUnavailableError, breaker, llm_stats
+from product_links import canonical_link, product_id
+from result_cursor import get_cursor, is_more_request
+from sql import sql_catalog_answer, sql_chain, sql_chain_stream, sql_guard_stats, sql_next_page
+from streaming import SSE_MEDIA_TYPE, coalesce, prepend, sse_event, wants_sse
 
 # ── Logging ───────────────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -37,11 +49,24 @@ _NO_DATA_PREFIXES = (
     "invalid query generated",
 )
 
+_NO_MORE_RESULTS = "That's all the matching products I have. Try a new search!"
+
+# `response` text in structured mode, where the products themselves are in `products`
+_PRODUCTS_LEAD = "Here are the matching products:"
+
+# Streams must reach the client token by token, so they opt out of gzip
+_NO_COMPRESSION = {"Content-Encoding": "identity"}
+
 # ── Paths ─────────────────────────────────────────────────────────────────────
 faqs_path = Path(__file__).parent / "resources/faq_data.csv"
+db_path = Path(__file__).parent / "db.sqlite"
 
 # ── Rate Limiter ──────────────────────────────────────────────────────────────
-limiter = Limiter(key_func=get_remote_address, default_limits=["20/minute"])
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=["20/minute"],
+    enabled=settings.RATE_LIMIT_ENABLED,  # disabled for load tests
+)
 
 # ── Conversation Session Store ────────────────────────────────────────────────
 SESSION_STORE: dict[str, dict] = {}
@@ -76,10 +101,25 @@ def update_session(session_id: str, query: str, response: str) -> None:
 
 
 # ── Lifespan ──────────────────────────────────────────────────────────────────
+def startup() -> None:
+    """Ingest FAQ data and refresh catalog aggregates (no-ops if already current)."""
+    ingest_faq_data(faqs_path)
+    try:
+        build_catalog_stats(db_path)
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        logger.warning("catalog stats not built: %s", e)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Ingest FAQ data on startup (no-op if already persisted)."""
-    ingest_faq_data(faqs_path)
+    """
+    Run the startup work before serving. Workers forked by serve.py skip it:
+    the launcher ran it once up front, so they only load the FAQ index it built.
+    """
+    if os.environ.get("SERVE_PREFORKED"):
+        refresh_faq_index()
+    else:
+        startup()
     yield
 
 
@@ -102,19 +142,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── Compression ──────────────────────────────────────────────────────────────
+# Negotiated via Accept-Encoding; small replies are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE)
+
 
 # ── Schemas ───────────────────────────────────────────────────────────────────
 class ChatRequest(BaseModel):
     query: str
     session_id: str = "default"
+    # Return product lists in `products` instead of markdown in `response`
+    structured: bool = False
+
+
+class Product(BaseModel):
+    pid: str | None = None
+    title: str | None = None
+    brand: str | None = None
+    price: int | None = None
+    discount: float | None = None
+    avg_rating: float | None = None
+    total_ratings: int | None = None
+    product_link: str | None = None
 
 
 class ChatResponse(BaseModel):
     route: str
     response: str
+    products: list[Product] | None = None
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
+def product_payload(rows: list[dict]) -> list[dict]:
+    """
+    Compact product dicts for clients: known fields only, canonical links,
+    and NaN as None. Also shortens links in databases loaded before ingest
+    canonicalized them.
+    """
+    products = []
+    for row in rows:
+        item = {
+            key: (None if isinstance(value, float) and value != value else value)
+            for key, value in row.items() if key in Product.model_fields
+        }
+        link = item.get("product_link")
+        item["product_link"] = canonical_link(link)
+        item["pid"] = item.get("pid") or product_id(link)
+        products.append(item)
+    return products
+
+
 def format_product_list(products: list) -> str:
     output = ""
     for item in products:
@@ -132,6 +209,76 @@ def format_product_list(products: list) -> str:
     return output.strip()
 
 
+async def _route(body: ChatRequest) -> tuple[str, str | None]:
+    """
+    Pick the route for a query without side effects. Returns (route, catalog
+    answer); the answer is set for "sql_stats", which needs no further work.
+    """
+    # "show more" pages the last product list from SQLite — no routing, no LLM
+    if is_more_request(body.query) and get_cursor(body.session_id) is not None:
+        return "sql_more", None
+    route_name = router(body.query).name or "unknown"
+    if route_name in ("sql", "unknown"):
+        # Aggregate questions are answered from the precomputed catalog stats
+        answer = await sql_catalog_answer(body.query)
+        if answer is not None:
+            return "sql_stats", answer
+    return route_name, None
+
+
+def _is_cheap(route_name: str, history: list[dict]) -> bool:
+    """
+    True if the request can start without an LLM call. FAQ retrieval is local
+    work; FAQs that turn out to need the LLM move to their own gate afterwards.
+    """
+    if route_name in ("sql_more", "sql_stats", "faq"):
+        return True
+    # Contextual / out-of-scope without history get the canned reply
+    return route_name != "sql" and not history
+
+
+async def _admit(route_name: str, cheap: bool) -> Ticket:
+    """Reserve a slot for the route, or shed the request with a fast 503."""
+    try:
+        return await admission.acquire(route_name, cheap)
+    except Overloaded as e:
+        logger.warning("admission | route=%s | rejected=%s", route_name, e.reason)
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy right now. Please retry in a moment.",
+            headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+        )
+
+
+async def _admit_and_prepare(
+    body: ChatRequest, history: list[dict]
+) -> tuple[str, Ticket, list | str | None, dict | None]:
+    """
+    Route, admit, then do the work the chains reuse. Returns (route, ticket,
+    precomputed SQL result, FAQ retrieval); the SQL result is a page for
+    "sql_more" or the answer for "sql_stats". Nothing with side effects (such
+    as advancing a result cursor) runs before the ticket is granted, so a
+    shed request leaves no trace.
+    """
+    route_name, answer = await _route(body)
+    ticket = await _admit(route_name, _is_cheap(route_name, history))
+    try:
+        if route_name == "sql_more":
+            return route_name, ticket, await sql_next_page(body.session_id), None
+        if route_name == "faq":
+            qa = await get_relevant_qa(body.query)
+            if ticket.gate == admission.CHEAP and (qa is None or direct_answer(qa) is None):
+                # Needs the LLM after all: trade the cheap slot for a FAQ slot
+                faq_ticket = await _admit(route_name, cheap=False)
+                ticket.release()
+                ticket = faq_ticket
+            return route_name, ticket, None, qa
+        return route_name, ticket, answer, None
+    except BaseException:
+        ticket.release()
+        raise
+
+
 # ── Endpoints ─────────────────────────────────────────────────────────────────
 
 @app.get("/health", tags=["Ops"])
@@ -144,7 +291,8 @@ async def health():
 async def admin_stats():
     """
     Admin dashboard — returns live server stats:
-    uptime, active sessions, ChromaDB collection info, SQLite product count.
+    uptime, active sessions, ChromaDB collection info, FAQ LLM bypass rate,
+    SQLite product count, admission gates, LLM retry/hedge/breaker counters.
     """
     # ── Uptime ────────────────────────────────────────────────────────────────
     uptime_seconds = int(time.time() - _SERVER_START)
@@ -169,7 +317,6 @@ async def admin_stats():
         chroma_status = str(e)
 
     # ── SQLite ────────────────────────────────────────────────────────────────
-    db_path = Path(__file__).parent / "db.sqlite"
     try:
         with sqlite3.connect(db_path) as conn:
             product_count = conn.execute("SELECT COUNT(*) FROM product").fetchone()[0]
@@ -178,6 +325,10 @@ async def admin_stats():
         product_count = None
         sqlite_status = str(e)
 
+    # ── FAQ direct answers ────────────────────────────────────────────────────
+    faq_total = faq_stats["direct"] + faq_stats["llm"]
+    bypass_rate = round(faq_stats["direct"] / faq_total, 3) if faq_total else None
+
     # ── Routes ────────────────────────────────────────────────────────────────
     available_routes = [r.name for r in router.routes]
 
@@ -194,13 +345,31 @@ async def admin_stats():
             "collection": collection_name_faq,
             "faq_documents": faq_doc_count,
         },
+        "faq": {
+            "direct_answers": faq_stats["direct"],
+            "llm_answers": faq_stats["llm"],
+            "bypass_rate": bypass_rate,
+            "max_distance": settings.FAQ_DIRECT_MAX_DISTANCE,
+        },
         "sqlite": {
             "status": sqlite_status,
             "product_count": product_count,
+            "query_guard": sql_guard_stats,
+            "catalog_answers": catalog_stats_counters,
         },
         "router": {
             "available_routes": available_routes,
         },
+        "admission": {
+            "prioritize_cheap": settings.ADMISSION_PRIORITIZE_CHEAP,
+            "max_wait_s": settings.ADMISSION_MAX_WAIT,
+            "gates": admission.snapshot(),
+        },
+        "llm": {
+            **llm_stats,
+            "breaker": breaker.state,
+            "hedging": settings.LLM_HEDGE,
+        },
     }
 
 
@@ -223,20 +392,31 @@ async def chat(request: Request, body: ChatRequest):
     """
     Main chat endpoint with conversation memory.
     Routes query to FAQ (semantic search) or SQL (text-to-SQL) chain.
-    Rate limited to 20 requests/minute per IP.
+    "Show more" follow-ups page through the last product list, and aggregate
+    catalog questions are answered from precomputed stats, without an LLM call.
+    Rate limited to 20 requests/minute per IP; returns 503 + Retry-After when
+    the route is saturated.
     """
     start = time.monotonic()
     route_name = "unknown"
+    ticket = None
     try:
         history = get_session_history(body.session_id)
-        route_name = router(body.query).name or "unknown"
-
-        if route_name == "faq":
-            result = await faq_chain(body.query, history)
+        route_name, ticket, page, qa = await _admit_and_prepare(body, history)
+
+        products = None
+        if route_name == "sql_more":
+            products = product_payload(page) if page else None
+            result = format_product_list(products) if page else _NO_MORE_RESULTS
+        elif route_name == "sql_stats":
+            result = page
+        elif route_name == "faq":
+            result = await faq_chain(body.query, history, qa)
         elif route_name == "sql":
-            result = await sql_chain(body.query, history)
+            result = await sql_chain(body.query, history, body.session_id)
             if isinstance(result, list):
-                result = format_product_list(result)
+                products = product_payload(result)
+                result = format_product_list(products)
         elif route_name == "contextual":
             result = await general_llm_fallback(body.query, history)
         else:
@@ -256,8 +436,23 @@ async def chat(request: Request, body: ChatRequest):
             "route=%s | session=%s | query=%r | time=%dms | status=ok",
             route_name, body.session_id[:8], body.query[:60], elapsed,
         )
+        if body.structured and products:
+            return ChatResponse(route=route_name, response=_PRODUCTS_LEAD, products=products)
         return ChatResponse(route=route_name, response=str(result))
 
+    except HTTPException:
+        raise
+    except LLMUnavailableError as e:
+        elapsed = round((time.monotonic() - start) * 1000)
+        logger.error(
+            "route=%s | session=%s | query=%r | time=%dms | status=llm_unavailable | err=%s",
+            route_name, body.session_id[:8], body.query[:60], elapsed, e,
+        )
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is temporarily unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(settings.LLM_BREAKER_COOLDOWN))},
+        )
     except Exception as e:
         elapsed = round((time.monotonic() - start) * 1000)
         logger.error(
@@ -265,6 +460,9 @@ async def chat(request: Request, body: ChatRequest):
             route_name, body.session_id[:8], body.query[:60], elapsed, e,
         )
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ticket is not None:
+            ticket.release()
 
 
 @app.post("/chat/stream", tags=["Chat"])
@@ -272,55 +470,76 @@ async def chat(request: Request, body: ChatRequest):
 async def chat_stream(request: Request, body: ChatRequest):
     """
     Streaming chat endpoint.
-    FAQ answers stream word-by-word. SQL answers are sent as a single chunk.
+    FAQ, LLM and aggregate SQL answers stream in coalesced token batches.
+    SQL product lists are sent as soon as the query returns.
+
+    Plain text by default. Send `Accept: text/event-stream` for Server-Sent
+    Events: `route`, `token`, `products`, `timing`, `error` and a final `done`.
     Rate limited to 20 requests/minute per IP.
     """
-    history = get_session_history(body.session_id)
-    route_name = router(body.query).name or "unknown"
     start = time.monotonic()
-
-    async def generate():
+    history = get_session_history(body.session_id)
+    # Admit before the response starts, so a shed request still gets a real 503
+    route_name, ticket, page, qa = await _admit_and_prepare(body, history)
+
+    async def events():
+        """Yield (event, payload) pairs for one turn; rendered as SSE or text below."""
+        nonlocal route_name
+        yield "route", {"route": route_name}
+        parts: list[str] = []
+        first_byte_ms = None
         try:
-            if route_name == "faq":
-                full_response = ""
-                async for chunk in faq_chain_stream(body.query, history):
-                    full_response += chunk
-                    yield chunk
-                update_session(body.session_id, body.query, full_response)
+            tokens = None
+            if route_name == "sql_more":
+                products = product_payload(page) if page else None
+                text = format_product_list(products) if page else _NO_MORE_RESULTS
+                first_byte_ms = round((time.monotonic() - start) * 1000)
+                parts.append(text)
+                if page:
+                    yield "products", {"products": products, "text": text}
+                else:
+                    yield "token", {"text": text}
+
+            elif route_name == "sql_stats":
+                first_byte_ms = round((time.monotonic() - start) * 1000)
+                parts.append(page)
+                yield "token", {"text": page}
+
+            elif route_name == "faq":
+                tokens = faq_chain_stream(body.query, history, qa)
 
             elif route_name == "sql":
-                result = await sql_chain(body.query, history)
-                if isinstance(result, list):
-                    result = format_product_list(result)
-
-                # Fallback if SQL returned no useful data
-                if isinstance(result, str) and result.lower().startswith(_NO_DATA_PREFIXES):
-                    full_response = ""
-                    async for chunk in general_llm_fallback_stream(body.query, history):
-                        full_response += chunk
-                        yield chunk
-                    update_session(body.session_id, body.query, full_response)
+                sql_stream = sql_chain_stream(body.query, history, body.session_id)
+                first = await anext(sql_stream, None)
+                if isinstance(first, list):
+                    products = product_payload(first)
+                    text = format_product_list(products)
+                    first_byte_ms = round((time.monotonic() - start) * 1000)
+                    parts.append(text)
+                    yield "products", {"products": products, "text": text}
+                elif first is None or first.lower().startswith(_NO_DATA_PREFIXES):
+                    # Fallback if SQL returned no useful data
+                    route_name = "fallback"
+                    yield "route", {"route": route_name}
+                    tokens = general_llm_fallback_stream(body.query, history)
                 else:
-                    update_session(body.session_id, body.query, str(result))
-                    yield str(result)
-
-            elif route_name == "contextual":
-                # Contextual follow-up: use session memory only
-                full_response = ""
-                async for chunk in general_llm_fallback_stream(body.query, history):
-                    full_response += chunk
-                    yield chunk
-                update_session(body.session_id, body.query, full_response)
+                    # Aggregate answer — stream the comprehension tokens
+                    tokens = prepend(first, sql_stream)
 
             else:
-                # Unknown / out-of-scope — no LLM call if no history
-                full_response = ""
-                async for chunk in general_llm_fallback_stream(body.query, history):
-                    full_response += chunk
-                    yield chunk
-                update_session(body.session_id, body.query, full_response)
+                # Contextual follow-up or out-of-scope — session memory only
+                tokens = general_llm_fallback_stream(body.query, history)
 
+            if tokens is not None:
+                async for batch in coalesce(tokens):
+                    if first_byte_ms is None:
+                        first_byte_ms = round((time.monotonic() - start) * 1000)
+                    parts.append(batch)
+                    yield "token", {"text": batch}
+
+            update_session(body.session_id, body.query, "".join(parts))
             elapsed = round((time.monotonic() - start) * 1000)
+            yield "timing", {"ttfb_ms": first_byte_ms, "total_ms": elapsed}
             logger.info(
                 "stream | route=%s | session=%s | query=%r | time=%dms",
                 route_name, body.session_id[:8], body.query[:60], elapsed,
@@ -331,6 +550,31 @@ async def chat_stream(request: Request, body: ChatRequest):
                 "stream | route=%s | session=%s | error=%s | time=%dms",
                 route_name, body.session_id[:8], e, elapsed,
             )
-            yield f"\n\n⚠️ Error: {e}"
-
-    return StreamingResponse(generate(), media_type="text/plain")
+            yield "error", {"message": str(e)}
+        finally:
+            ticket.release()
+        yield "done", {}
+
+    async def generate_text():
+        async for event, data in events():
+            if event in ("token", "products"):
+                yield data["text"]
+            elif event == "error":
+                yield f"\n\n⚠️ Error: {data['message']}"
+
+    async def generate_sse():
+        async for event, data in events():
+            yield sse_event(event, data)
+
+    # Also release after the response, in case the client left before streaming began
+    release = BackgroundTask(ticket.release)
+    if wants_sse(request.headers.get("accept")):
+        return StreamingResponse(
+            generate_sse(),
+            media_type=SSE_MEDIA_TYPE,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **_NO_COMPRESSION},
+            background=release,
+        )
+    return StreamingResponse(
+        generate_text(), media_type="text/plain", headers=_NO_COMPRESSION, background=release
+    )
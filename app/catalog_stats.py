@@ -0,0 +1,371 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Brands with fewer products than this are left out of brand rankings
+MIN_RANKED_PRODUCTS = 5
+TOP_N = 5
+_ALL = "*"  # brand_key of the catalog-wide row
+
+_cache: dict = {"mtime": None, "stats": None, "matcher": None}
+_cache_lock = threading.Lock()
+
+# Counters reported by /admin/stats
+catalog_stats_counters = {"answered": 0, "passed": 0}
+
+
+# ── Brand matcher ─────────────────────────────────────────────────────────────
+# Hyphens split words ("highest-discount", "li-ning"); hyphenated brand names
+# still match, as a sequence of tokens
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+
+
+def _tokens(text: str) -> list[str]:
+    return [t.removesuffix("'s") for t in _TOKEN.findall(text.lower())]
+
+
+class BrandMatcher:
+    """
+    Token trie over brand names. find() walks the question once and returns
+    the longest brand starting at each token, so multi-word brands
+    ("red tape", "new balance") win over shorter overlaps.
+    "X by Y" sub-brands also match on "X" alone ("hrx").
+    """
+
+    _END = object()
+
+    def __init__(self, brands: dict[str, str]):
+        self._trie: dict = {}
+        for key in brands:
+            tokens = _tokens(key)
+            self._add(tokens, key)
+            if len(tokens) > 2 and tokens[1] == "by":
+                self._add(tokens[:1], key)
+
+    def _add(self, tokens: list[str], key: str) -> None:
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(self._END, key)
+
+    def find(self, tokens: list[str]) -> list[tuple[str, int, int]]:
+        """(brand_key, start, end) for every brand mention in `tokens`."""
+        found, i = [], 0
+        while i < len(tokens):
+            node, match = self._trie, None
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if self._END in node:
+                    match = (node[self._END], i, j + 1)
+            if match:
+                found.append(match)
+                i = match[2]
+            else:
+                i += 1
+        return found
+
+
+# ── Build ─────────────────────────────────────────────────────────────────────
+def _brand_key(brand) -> str:
+    return " ".join(str(brand or "").lower().split())
+
+
+def _signature(group: pd.DataFrame) -> str:
+    rows = group[["title", "price", "discount", "avg_rating", "total_ratings"]].astype(str)
+    payload = "\n".join(sorted("|".join(r) for r in rows.itertuples(index=False)))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _summarize(group: pd.DataFrame, brand: str) -> dict:
+    price, discount, rating = group["price"], group["discount"], group["avg_rating"]
+
+    def num(value, digits=2):
+        return None if pd.isna(value) else round(float(value), digits)
+
+    return {
+        "brand": brand,
+        "count": int(len(group)),
+        "price": {
+            "min": num(price.min()), "p25": num(price.quantile(0.25)),
+            "median": num(price.median()), "p75": num(price.quantile(0.75)),
+            "max": num(price.max()), "mean": num(price.mean()),
+        },
+        "discount": {
+            "median": num(discount.median(), 3), "mean": num(discount.mean(), 3),
+            "max": num(discount.max(), 3),
+        },
+        "rating": {"median": num(rating.median()), "mean": num(rating.mean())},
+        "total_ratings": int(group["total_ratings"].fillna(0).sum()),
+    }
+
+
+_RANKINGS = {
+    "most_products", "highest_discount", "lowest_discount", "best_rated",
+    "worst_rated", "most_ratings", "most_expensive", "cheapest",
+}
+
+
+def _rankings(brands: list[dict]) -> dict:
+    """Top-N brand lists for the catalog-wide row."""
+    ranked = [b for b in brands if b["count"] >= MIN_RANKED_PRODUCTS]
+
+    def top(metric, reverse=True, pool=ranked):
+        rows = [b for b in pool if metric(b) is not None]
+        rows.sort(key=metric, reverse=reverse)
+        return [b["brand"] for b in rows[:TOP_N]]
+
+    return {
+        "most_products": top(lambda b: b["count"], pool=brands),
+        "highest_discount": top(lambda b: b["discount"]["mean"]),
+        "lowest_discount": top(lambda b: b["discount"]["mean"], reverse=False),
+        "best_rated": top(lambda b: b["rating"]["mean"]),
+        "worst_rated": top(lambda b: b["rating"]["mean"], reverse=False),
+        "most_ratings": top(lambda b: b["total_ratings"], pool=brands),
+        "most_expensive": top(lambda b: b["price"]["median"]),
+        "cheapest": top(lambda b: b["price"]["median"], reverse=False),
+    }
+
+
+def build_catalog_stats(db_path: str | Path) -> int:
+    """
+    Materialize per-brand aggregates (counts, price / discount / rating
+    percentiles) and catalog-wide brand rankings into the `catalog_stats`
+    table. Incremental: only brands whose rows changed since the last build
+    are recomputed. Returns the number of brands recomputed.
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog_stats "
+            "(brand_key TEXT PRIMARY KEY, signature TEXT, stats TEXT)"
+        )
+        df = pd.read_sql_query(
+            "SELECT title, brand, price, discount, avg_rating, total_ratings FROM product", conn
+        )
+        stored = {
+            key: (signature, json.loads(stats))
+            for key, signature, stats in conn.execute(
+                "SELECT brand_key, signature, stats FROM catalog_stats"
+            )
+        }
+
+        df["brand_key"] = df["brand"].map(_brand_key)
+        df = df[df["brand_key"] != ""]
+        changed, brands = [], []
+        for key, group in df.groupby("brand_key"):
+            signature = _signature(group)
+            if key in stored and stored[key][0] == signature:
+                brands.append(stored[key][1])
+                continue
+            # Display the most common spelling of the brand
+            name = group["brand"].str.strip().mode().iloc[0]
+            stats = _summarize(group, name)
+            changed.append((key, signature, json.dumps(stats)))
+            brands.append(stats)
+
+        gone = set(stored) - set(df["brand_key"]) - {_ALL}
+        # Rebuilt when a brand changed, or when it predates a ranking added since
+        outdated = _ALL not in stored or not _RANKINGS <= set(stored[_ALL][1].get("rankings", {}))
+        if changed or gone or outdated:
+            overall = _summarize(df, "all brands")
+            overall["rankings"] = _rankings(brands)
+            changed.append((_ALL, "", json.dumps(overall)))
+        conn.executemany("DELETE FROM catalog_stats WHERE brand_key = ?", [(k,) for k in gone])
+        conn.executemany("INSERT OR REPLACE INTO catalog_stats VALUES (?, ?, ?)", changed)
+
+    recomputed = len(changed) - (1 if changed and changed[-1][0] == _ALL else 0)
+    print(f"Catalog stats: {len(brands)} brands, {recomputed} recomputed.")
+    return recomputed
+
+
+def _load_stats(db_path: str | Path) -> tuple[dict, BrandMatcher] | None:
+    """Read the materialized stats, reloading when the database file changes."""
+    try:
+        mtime = Path(db_path).stat().st_mtime
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        if _cache["mtime"] != mtime:
+            try:
+                with sqlite3.connect(db_path) as conn:
+                    rows = conn.execute("SELECT brand_key, stats FROM catalog_stats").fetchall()
+            except sqlite3.OperationalError:
+                rows = []  # not built yet
+            stats = {key: json.loads(s) for key, s in rows}
+            brands = {key: s for key, s in stats.items() if key != _ALL}
+            _cache.update(mtime=mtime, stats=stats, matcher=BrandMatcher(brands))
+        if not _cache["stats"]:
+            return None
+        return _cache["stats"], _cache["matcher"]
+
+
+def find_brands(db_path: str | Path, question: str) -> list[str]:
+    """Brand keys (lower-cased brand names) mentioned in `question`."""
+    loaded = _load_stats(db_path)
+    if loaded is None:
+        return []
+    _, matcher = loaded
+    return list(dict.fromkeys(key for key, _, _ in matcher.find(_tokens(question))))
+
+
+# ── Answering ─────────────────────────────────────────────────────────────────
+# Words an aggregate question may contain besides a brand name. Anything else
+# ("running", "women", "under 3000") narrows the question beyond what the
+# per-brand aggregates cover, so it goes to text-to-SQL instead.
+_VOCABULARY = set("""
+    what whats is are was the of for a an on in by at do does you your we have has
+    how many much number count total tell me give show please overall all across
+    there sell carry stock catalog catalogue store available offer offered
+    average avg mean typical usual median price prices priced cost costs rs rupees
+    range discount discounts off rating ratings rated rate
+    shoe shoes product products item items pair pairs footwear
+    brand brands which one who with highest high most best top biggest largest
+    lowest least lower worst poorest cheapest cheaper cheap expensive costliest
+    priciest affordable
+    give generally usually
+""".split())
+
+_METRIC_WORDS = {
+    "price": {"price", "prices", "priced", "cost", "costs", "expensive", "cheap",
+              "cheapest", "cheaper", "costliest", "priciest", "affordable"},
+    "discount": {"discount", "discounts", "off"},
+    "rating": {"rating", "ratings", "rated", "rate"},
+}
+_MEAN = {"average", "avg", "mean", "typical", "usual", "generally", "usually"}
+_COUNT = {"many", "number", "count", "total"}
+# A brand question is a ranking only with one of these; "average rating
+# across all brands" is a catalog-wide average
+_RANKING_WORDS = {
+    "which", "who", "top", "highest", "most", "best", "biggest", "largest",
+    "lowest", "least", "worst", "cheapest", "costliest", "priciest",
+}
+_CHEAP = {"cheapest", "cheaper", "cheap", "affordable", "lowest", "least"}
+_LOW = {"lowest", "least", "lower", "worst", "poorest"}
+
+
+def _rupees(value) -> str:
+    return f"Rs. {value:,.0f}"
+
+
+def _percent(value) -> str:
+    return f"{value * 100:.0f}%"
+
+
+def _metric(words: set[str]) -> str | None:
+    found = [m for m, vocab in _METRIC_WORDS.items() if words & vocab]
+    return found[0] if len(found) == 1 else None
+
+
+def _describe(stats: dict, metric: str | None, words: set[str]) -> str | None:
+    """Answer a count / average / range question about one brand (or all of them)."""
+    name = stats["brand"]
+    subject = "products in our catalog" if name == "all brands" else f"{name} products"
+
+    if words & _COUNT and metric is None:
+        if name == "all brands":
+            return f"We have {stats['count']:,} products in our catalog."
+        return f"We have {stats['count']:,} {name} products."
+
+    if metric == "price":
+        p = stats["price"]
+        if p["median"] is None:
+            return None
+        if "range" in words:
+            return (
+                f"Prices for {subject} range from {_rupees(p['min'])} to {_rupees(p['max'])}, "
+                f"with most between {_rupees(p['p25'])} and {_rupees(p['p75'])}."
+            )
+        if words & _MEAN or "median" in words:
+            return (
+                f"The average price for {subject} is {_rupees(p['mean'])} "
+                f"(median {_rupees(p['median'])}, across {stats['count']:,} products)."
+            )
+    if metric == "discount" and (words & _MEAN or "median" in words):
+        d = stats["discount"]
+        if d["mean"] is None:
+            return None
+        return (
+            f"The average discount on {subject} is {_percent(d['mean'])}, "
+            f"going up to {_percent(d['max'])}."
+        )
+    if metric == "rating" and (words & _MEAN or "median" in words):
+        r = stats["rating"]
+        if r["mean"] is None:
+            return None
+        return (
+            f"The average rating for {subject} is {r['mean']:.1f} out of 5, "
+            f"from {stats['total_ratings']:,} ratings."
+        )
+    return None
+
+
+def _rank(overall: dict, metric: str | None, words: set[str]) -> str | None:
+    """Answer a "which brand has the ..." question from the stored rankings."""
+    rankings = overall.get("rankings", {})
+    if metric is None and words & {"most", "many"} and words & {"products", "shoes", "items"}:
+        key, what = "most_products", "the most products"
+    elif metric == "rating" and words & (_COUNT | {"most", "least"}):
+        # "most rated", "highest number of ratings": a count, not the average
+        if words & _LOW:
+            return None
+        key, what = "most_ratings", "the most ratings"
+    elif metric in ("price", "discount") and words & _COUNT:
+        return None
+    elif metric == "discount" and words & _LOW:
+        key, what = "lowest_discount", "the lowest average discount"
+    elif metric == "discount":
+        key, what = "highest_discount", "the highest average discount"
+    elif metric == "rating" and words & _LOW:
+        key, what = "worst_rated", "the lowest average rating"
+    elif metric == "rating":
+        key, what = "best_rated", "the best average rating"
+    elif metric == "price" and words & _CHEAP:
+        key, what = "cheapest", "the lowest prices"
+    elif metric == "price" and words & {"expensive", "costliest", "priciest", "highest"}:
+        key, what = "most_expensive", "the highest prices"
+    else:
+        return None
+    top = rankings.get(key)
+    if not top:
+        return None
+    answer = f"{top[0]} has {what}"
+    if len(top) > 1:
+        answer += f", followed by {', '.join(top[1:-1])}{' and ' if len(top) > 2 else ''}{top[-1]}"
+    return answer + "."
+
+
+def catalog_answer(db_path: str | Path, question: str) -> str | None:
+    """
+    Answer a statistical catalog question ("average price of Nike shoes",
+    "how many Puma products", "highest-discount brand") from the
+    materialized aggregates, or None if the question needs text-to-SQL.
+    """
+    loaded = _load_stats(db_path)
+    if loaded is None:
+        return None
+    stats, matcher = loaded
+
+    tokens = _tokens(question)
+    brands = matcher.find(tokens)
+    covered = {i for _, start, end in brands for i in range(start, end)}
+    rest = [t for i, t in enumerate(tokens) if i not in covered]
+    words = set(rest)
+
+    answer = None
+    if len({key for key, _, _ in brands}) <= 1 and words <= _VOCABULARY:
+        metric = _metric(words)
+        if brands:
+            answer = _describe(stats[brands[0][0]], metric, words)
+        elif words & _RANKING_WORDS and words & {"brand", "brands"}:
+            answer = _rank(stats[_ALL], metric, words)
+        else:
+            answer = _describe(stats[_ALL], metric, words)
+
+    catalog_stats_counters["answered" if answer else "passed"] += 1
+    return answer
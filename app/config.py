@@ -11,7 +11,59 @@ class Settings(BaseSettings):
 
     GROQ_API_KEY: str
     GROQ_MODEL: str
+    GROQ_BASE_URL: str | None = None   # point at benchmarks/fake_groq.py for offline runs
     CHROMA_DB_PATH: str = str(Path(__file__).parent / "chroma_db")
+    RATE_LIMIT_ENABLED: bool = True
+    # Squared-L2 distance under which the stored FAQ answer is returned without
+    # an LLM call (0.35 ~ cosine similarity 0.82). Set to 0 to always use the LLM.
+    FAQ_DIRECT_MAX_DISTANCE: float = 0.35
+    # FAQ collections up to this size are searched in memory with NumPy
+    FAQ_INDEX_MAX_DOCS: int = 50_000
+    # Semantic title search when the generated SQL finds no products
+    PRODUCT_SEMANTIC_SEARCH: bool = True
+    PRODUCT_SEARCH_MIN_SCORE: float = 0.3   # cosine similarity floor
+    # Answer count / average / brand-ranking questions from catalog_stats, no LLM
+    CATALOG_STATS_ANSWERS: bool = True
+
+    # LLM call resilience (llm.py): per-route deadlines in seconds cover all retries
+    LLM_DEADLINES: dict[str, float] = {
+        "faq": 10.0,
+        "fallback": 10.0,
+        "sql_generation": 15.0,
+        "sql_comprehension": 15.0,
+    }
+    LLM_DEFAULT_DEADLINE: float = 15.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_BACKOFF_BASE: float = 0.25
+    LLM_BACKOFF_MAX: float = 2.0
+    LLM_HEDGE: bool = False               # send a backup request after the route's p95
+    LLM_HEDGE_DEFAULT_DELAY: float = 2.0  # used until 20 latency samples exist
+    LLM_HEDGE_MIN_DELAY: float = 0.3
+    LLM_BREAKER_THRESHOLD: int = 5        # consecutive failures before failing fast
+    LLM_BREAKER_COOLDOWN: float = 30.0
+
+    # Admission control (admission.py): concurrent requests per route
+    ADMISSION_LIMITS: dict[str, int] = {
+        "faq": 16,
+        "sql": 8,
+        "contextual": 8,
+        "cheap": 64,   # no LLM call: direct FAQ answers, cached SQL pages
+    }
+    ADMISSION_DEFAULT_LIMIT: int = 4
+    ADMISSION_QUEUE_SIZE: int = 16        # waiting requests per route before shedding
+    ADMISSION_MAX_WAIT: float = 2.0       # seconds a request may wait for a slot
+    ADMISSION_PRIORITIZE_CHEAP: bool = True
+    ADMISSION_RETRY_AFTER: int = 2
+
+    # Responses at least this many bytes are gzipped when the client accepts it
+    GZIP_MIN_SIZE: int = 1000
+
+    # Cost guard for LLM-generated SQL (sql._run_query_sync)
+    SQL_MAX_SCAN_ROWS: int = 250_000      # reject plans estimated to visit more rows
+    SQL_TIME_BUDGET_MS: int = 1000        # abort statements running longer
+    SQL_VM_STEP_BUDGET: int = 50_000_000  # ...or executing more VM instructions
+    SQL_MAX_ROWS: int = 200               # outer cap on rows fetched
+    SQL_GENERATION_MARGIN: float = 10.0   # seconds past the first-token deadline for the rest of the SQL
 
 
 settings = Settings()
@@ -5,9 +5,9 @@ from typing import AsyncGenerator
 
 import chromadb
 from chromadb.utils import embedding_functions
-from groq import AsyncGroq
-
 from config import settings
+from llm import chat_completion, chat_completion_stream
+from vector_index import VectorIndex
 
 GROQ_MODEL = settings.GROQ_MODEL
 
@@ -15,7 +15,6 @@ GROQ_MODEL = settings.GROQ_MODEL
 chroma_db_path = settings.CHROMA_DB_PATH
 chroma_client = chromadb.PersistentClient(path=chroma_db_path)
 collection_name_faq = "faqs"
-groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY)  # explicit key from config
 
 ef = embedding_functions.SentenceTransformerEmbeddingFunction(
     model_name="sentence-transformers/all-MiniLM-L6-v2"
@@ -23,10 +22,22 @@ ef = embedding_functions.SentenceTransformerEmbeddingFunction(
 
 _SYSTEM_PROMPT = "You are a helpful e-commerce customer support assistant."
 
+# Counters for the direct-answer bypass, reported by /admin/stats
+faq_stats = {"direct": 0, "llm": 0}
+
+# In-memory copy of the FAQ collection; ChromaDB stays the durable store.
+# None until refresh_faq_index() runs, or when the collection is too large.
+_faq_index: VectorIndex | None = None
+_faq_collection = None
+
 
 # ── Ingestion ─────────────────────────────────────────────────────────────────
 def ingest_faq_data(path: str | Path) -> None:
-    """Load FAQ CSV into persistent ChromaDB. No-op if collection already exists."""
+    """
+    Load FAQ CSV into persistent ChromaDB. No-op if collection already exists.
+    An optional `direct_answer` column holds a pre-written reply used instead
+    of `answer` when a query matches closely enough to skip the LLM.
+    """
     existing = [c.name for c in chroma_client.list_collections()]
     if collection_name_faq not in existing:
         print("Ingesting FAQ data to ChromaDB...")
@@ -37,26 +48,70 @@ def ingest_faq_data(path: str | Path) -> None:
         df = pd.read_csv(path)
         docs = df["question"].to_list()
         metadata = [{"answer": ans} for ans in df["answer"].to_list()]
+        if "direct_answer" in df.columns:
+            for meta, direct in zip(metadata, df["direct_answer"].to_list()):
+                if isinstance(direct, str) and direct.strip():
+                    meta["direct_answer"] = direct.strip()
         ids = [f"id_{i}" for i in range(len(docs))]
         collection.add(documents=docs, metadatas=metadata, ids=ids)
         print(f"Ingested {len(docs)} FAQs.")
     else:
         print(f"Collection '{collection_name_faq}' already exists — skipping ingestion.")
+    refresh_faq_index()
+
+
+def refresh_faq_index() -> None:
+    """
+    Rebuild the in-memory FAQ index from the stored ChromaDB embeddings.
+    Collections above FAQ_INDEX_MAX_DOCS are left to ChromaDB.
+    """
+    global _faq_index, _faq_collection
+    collection = chroma_client.get_collection(collection_name_faq, embedding_function=ef)
+    _faq_collection = collection
+
+    count = collection.count()
+    if count > settings.FAQ_INDEX_MAX_DOCS:
+        _faq_index = None
+        print(f"FAQ collection has {count} docs — querying ChromaDB directly.")
+        return
+
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    _faq_index = VectorIndex(
+        data["ids"], data["embeddings"], data["documents"], data["metadatas"]
+    )
+    print(f"Loaded {count} FAQs into the in-memory index.")
 
 
 # ── Retrieval ─────────────────────────────────────────────────────────────────
 def _get_relevant_qa_sync(query: str) -> dict:
-    collection = chroma_client.get_collection(
+    index = _faq_index
+    if index is not None:
+        return index.query(ef([query])[0], n_results=2)
+
+    collection = _faq_collection or chroma_client.get_collection(
         collection_name_faq, embedding_function=ef
     )
     return collection.query(query_texts=[query], n_results=2)
 
 
 async def get_relevant_qa(query: str) -> dict:
-    """Run ChromaDB query in a thread (ChromaDB is synchronous)."""
+    """Embed and search in a thread (the encoder and ChromaDB are synchronous)."""
     return await asyncio.to_thread(_get_relevant_qa_sync, query)
 
 
+def direct_answer(result: dict) -> str | None:
+    """
+    Return the stored answer if the top match is within FAQ_DIRECT_MAX_DISTANCE,
+    else None (the caller then asks the LLM).
+    """
+    threshold = settings.FAQ_DIRECT_MAX_DISTANCE
+    distances = (result.get("distances") or [[]])[0]
+    if threshold <= 0 or not distances or distances[0] > threshold:
+        return None
+    meta = result["metadatas"][0][0]
+    return meta.get("direct_answer") or meta.get("answer")
+
+
 # ── Out-of-scope canned reply ────────────────────────────────────────────────
 _OUT_OF_SCOPE = (
     "I'm sorry, I don't have information about that. \n\n"
@@ -95,12 +150,12 @@ async def general_llm_fallback(
     messages.extend(history[-10:])
     messages.append({"role": "user", "content": query})
 
-    completion = await groq_client.chat.completions.create(
+    return await chat_completion(
+        "fallback",
         messages=messages,
         model=GROQ_MODEL,
         temperature=0.1,
     )
-    return completion.choices[0].message.content
 
 
 async def general_llm_fallback_stream(
@@ -115,16 +170,13 @@ async def general_llm_fallback_stream(
     messages.extend(history[-10:])
     messages.append({"role": "user", "content": query})
 
-    stream = await groq_client.chat.completions.create(
+    async for content in chat_completion_stream(
+        "fallback",
         messages=messages,
         model=GROQ_MODEL,
-        stream=True,
         temperature=0.1,
-    )
-    async for chunk in stream:
-        content = chunk.choices[0].delta.content
-        if content:
-            yield content
+    ):
+        yield content
 
 
 # ── LLM — non-streaming ───────────────────────────────────────────────────────
@@ -142,11 +194,7 @@ async def generate_answer(
         messages.extend(history[-10:])
     messages.append({"role": "user", "content": prompt})
 
-    completion = await groq_client.chat.completions.create(
-        messages=messages,
-        model=GROQ_MODEL,
-    )
-    return completion.choices[0].message.content
+    return await chat_completion("faq", messages=messages, model=GROQ_MODEL)
 
 
 # ── LLM — streaming ───────────────────────────────────────────────────────────
@@ -165,29 +213,40 @@ async def generate_answer_stream(
         messages.extend(history[-10:])
     messages.append({"role": "user", "content": prompt})
 
-    stream = await groq_client.chat.completions.create(
-        messages=messages,
-        model=GROQ_MODEL,
-        stream=True,
-    )
-    async for chunk in stream:
-        content = chunk.choices[0].delta.content
-        if content:
-            yield content
+    async for content in chat_completion_stream("faq", messages=messages, model=GROQ_MODEL):
+        yield content
 
 
 # ── Chains ────────────────────────────────────────────────────────────────────
-async def faq_chain(query: str, history: list[dict] | None = None) -> str:
-    result = await get_relevant_qa(query)
+async def faq_chain(
+    query: str, history: list[dict] | None = None, result: dict | None = None
+) -> str:
+    """Answer from the FAQs. `result` lets a caller pass an existing retrieval."""
+    if result is None:
+        result = await get_relevant_qa(query)
+    answer = direct_answer(result)
+    if answer is not None:
+        faq_stats["direct"] += 1
+        return answer
+
+    faq_stats["llm"] += 1
     context = "".join(r.get("answer", "") for r in result["metadatas"][0])
     return await generate_answer(query, context, history)
 
 
 async def faq_chain_stream(
-    query: str, history: list[dict] | None = None
+    query: str, history: list[dict] | None = None, result: dict | None = None
 ) -> AsyncGenerator[str, None]:
     """Async generator for streaming FAQ answers."""
-    result = await get_relevant_qa(query)
+    if result is None:
+        result = await get_relevant_qa(query)
+    answer = direct_answer(result)
+    if answer is not None:
+        faq_stats["direct"] += 1
+        yield answer
+        return
+
+    faq_stats["llm"] += 1
     context = "".join(r.get("answer", "") for r in result["metadatas"][0])
     async for chunk in generate_answer_stream(query, context, history):
         yield chunk
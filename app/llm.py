@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import AsyncGenerator
+
+import groq
+from groq import AsyncGroq
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# One client for every chain. Retries live here, not in the SDK.
+groq_client = AsyncGroq(
+    api_key=settings.GROQ_API_KEY,  # explicit key from config
+    base_url=settings.GROQ_BASE_URL,
+    max_retries=0,
+)
+
+_RETRYABLE = (
+    asyncio.TimeoutError,
+    groq.APITimeoutError,
+    groq.APIConnectionError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+)
+
+# Counters reported by /admin/stats
+llm_stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0, "rejected": 0}
+
+
+class LLMUnavailableError(RuntimeError):
+    """Groq could not answer within the route's deadline, or the breaker is open."""
+
+
+# ── Circuit breaker ───────────────────────────────────────────────────────────
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds. After that a single trial call is let through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """A call ended without an outcome (cancelled); let the next call be the trial."""
+        self._trial_running = False
+
+
+breaker = CircuitBreaker(settings.LLM_BREAKER_THRESHOLD, settings.LLM_BREAKER_COOLDOWN)
+
+
+# ── Latency tracking (drives the hedge delay) ─────────────────────────────────
+_latencies: dict[str, deque] = {}
+
+
+def _record_latency(route: str, seconds: float) -> None:
+    _latencies.setdefault(route, deque(maxlen=200)).append(seconds)
+
+
+def hedge_delay(route: str) -> float:
+    """p95 of recent latencies for the route, or the configured default."""
+    samples = _latencies.get(route)
+    if not samples or len(samples) < 20:
+        return settings.LLM_HEDGE_DEFAULT_DELAY
+    ordered = sorted(samples)
+    return max(settings.LLM_HEDGE_MIN_DELAY, ordered[int(len(ordered) * 0.95) - 1])
+
+
+def _deadline(route: str) -> float:
+    return settings.LLM_DEADLINES.get(route, settings.LLM_DEFAULT_DEADLINE)
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    cap = min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+# ── Non-streaming ─────────────────────────────────────────────────────────────
+async def _create(kwargs: dict) -> str:
+    completion = await groq_client.chat.completions.create(**kwargs)
+    return completion.choices[0].message.content
+
+
+async def _hedged(route: str, kwargs: dict) -> str:
+    """Fire a second identical request if the first is slower than the route's p95."""
+    tasks = [asyncio.ensure_future(_create(kwargs))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay(route))
+        if done:
+            return tasks[0].result()
+
+        llm_stats["hedges"] += 1
+        tasks.append(asyncio.ensure_future(_create(kwargs)))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is tasks[1]:
+                        llm_stats["hedge_wins"] += 1
+                    return task.result()
+        # Both failed — surface the original request's error
+        return tasks[0].result()
+    finally:
+        # Whichever request lost (or the deadline) cancels the rest
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def chat_completion(route: str, **kwargs) -> str:
+    """
+    Groq chat completion with a per-route deadline, bounded retries with
+    jittered backoff, optional hedging and a shared circuit breaker.
+    Returns the message content; raises LLMUnavailableError on give-up.
+    """
+    if not breaker.allow():
+        llm_stats["rejected"] += 1
+        raise LLMUnavailableError("LLM circuit breaker is open")
+
+    llm_stats["calls"] += 1
+    start = time.monotonic()
+    deadline = start + _deadline(route)
+    last_error: Exception | None = None
+
+    try:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                call = _hedged(route, kwargs) if settings.LLM_HEDGE else _create(kwargs)
+                content = await asyncio.wait_for(call, timeout=remaining)
+            except _RETRYABLE as e:
+                last_error = e
+                logger.warning("llm | route=%s | attempt=%d | retryable error: %r", route, attempt + 1, e)
+                if attempt < settings.LLM_MAX_RETRIES:
+                    llm_stats["retries"] += 1
+                    await asyncio.sleep(min(_backoff(attempt), max(0.0, deadline - time.monotonic())))
+                continue
+            except Exception as e:
+                # A 4xx means Groq is up; anything else counts against the breaker
+                if isinstance(e, groq.APIStatusError):
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                llm_stats["failures"] += 1
+                raise
+
+            breaker.record_success()
+            _record_latency(route, time.monotonic() - start)
+            return content
+    except asyncio.CancelledError:
+        # Says nothing about Groq's health, but must not strand a half-open trial
+        breaker.release_trial()
+        raise
+
+    breaker.record_failure()
+    llm_stats["failures"] += 1
+    raise LLMUnavailableError(f"LLM call for '{route}' failed: {last_error!r}") from last_error
+
+
+# ── Streaming ─────────────────────────────────────────────────────────────────
+async def _open_stream(kwargs: dict):
+    """Open a stream and wait for its first content chunk."""
+    stream = await groq_client.chat.completions.create(stream=True, **kwargs)
+    try:
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content
+            if content:
+                return stream, content
+    except BaseException:
+        # Timed out, cancelled or failed before the first token: release the response
+        await stream.close()
+        raise
+    return stream, None
+
+
+async def chat_completion_stream(route: str, **kwargs) -> AsyncGenerator[str, None]:
+    """
+    Streaming counterpart of chat_completion. Deadline and retries cover the
+    time to the first token; once text has been sent nothing is retried.
+    """
+    if not breaker.allow():
+        llm_stats["rejected"] += 1
+        raise LLMUnavailableError("LLM circuit breaker is open")
+
+    llm_stats["calls"] += 1
+    start = time.monotonic()
+    deadline = start + _deadline(route)
+    last_error: Exception | None = None
+    opened = None
+
+    try:
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                opened = await asyncio.wait_for(_open_stream(kwargs), timeout=remaining)
+                break
+            except _RETRYABLE as e:
+                last_error = e
+                logger.warning("llm | route=%s | attempt=%d | retryable error: %r", route, attempt + 1, e)
+                if attempt < settings.LLM_MAX_RETRIES:
+                    llm_stats["retries"] += 1
+                    await asyncio.sleep(min(_backoff(attempt), max(0.0, deadline - time.monotonic())))
+            except Exception as e:
+                # A 4xx means Groq is up; anything else counts against the breaker
+                if isinstance(e, groq.APIStatusError):
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+                llm_stats["failures"] += 1
+                raise
+    except asyncio.CancelledError:
+        breaker.release_trial()
+        raise
+
+    if opened is None:
+        breaker.record_failure()
+        llm_stats["failures"] += 1
+        raise LLMUnavailableError(f"LLM stream for '{route}' failed: {last_error!r}") from last_error
+
+    breaker.record_success()
+    _record_latency(route, time.monotonic() - start)
+    stream, first = opened
+    try:
+        if first:
+            yield first
+        async for chunk in stream:
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
+    finally:
+        # Also runs when the caller stops early (aclose), dropping the HTTP stream
+        await stream.close()
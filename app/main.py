@@ -91,6 +91,16 @@ with st.sidebar:
                 f"- **FAQ docs**: {chroma['faq_documents']}"
             )
 
+            # FAQ direct answers
+            st.subheader("⚡ FAQ Direct Answers")
+            faq = stats["faq"]
+            rate = faq["bypass_rate"]
+            st.markdown(
+                f"- **Direct answers**: {faq['direct_answers']}\n"
+                f"- **LLM answers**: {faq['llm_answers']}\n"
+                f"- **LLM bypass rate**: {'n/a' if rate is None else f'{rate:.0%}'}"
+            )
+
             # SQLite
             st.subheader("🛍️ Products DB")
             sql_info = stats["sqlite"]
@@ -98,6 +108,20 @@ with st.sidebar:
                 f"- **Status**: `{sql_info['status']}`\n"
                 f"- **Products**: {sql_info['product_count']:,}"
             )
+            guard = sql_info["query_guard"]
+            st.caption(
+                f"Query guard — ok: {guard['ok']}, truncated: {guard['truncated']}, "
+                f"rejected: {guard['rejected_plan']}, aborted: {guard['aborted_budget']}"
+            )
+
+            # Admission control
+            st.subheader("🚦 Admission")
+            for name, gate in stats["admission"]["gates"].items():
+                shed = gate["rejected_full"] + gate["rejected_timeout"]
+                st.markdown(
+                    f"- `{name}`: {gate['active']}/{gate['limit']} active, "
+                    f"{gate['waiting']} waiting, {shed} shed"
+                )
 
             # Router
             st.subheader("🔀 Routes")
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Float16 embedding matrix (memory-mapped at query time) and its row keys
+vectors_path = Path(__file__).parent / "product_vectors.npy"
+keys_path = Path(__file__).parent / "product_vectors.json"
+
+_model = None
+_model_lock = threading.Lock()
+_cache: dict = {"mtime": None, "matrix": None, "rowids": None}
+
+_SCORE_CHUNK = 8192  # rows converted to float32 at a time when scoring
+
+
+# ── Encoder ───────────────────────────────────────────────────────────────────
+def _encoder():
+    """
+    Load the sentence-transformers model on first use. faq.py's ChromaDB
+    embedding function uses the same model, and chromadb caches instances
+    per name, so both share one copy of the weights.
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+            SentenceTransformerEmbeddingFunction(model_name=MODEL_NAME)
+            _model = SentenceTransformerEmbeddingFunction.models[MODEL_NAME]
+    return _model
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    return _encoder().encode(
+        texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+    ).astype(np.float16)
+
+
+def _product_text(title, brand) -> str:
+    return f"{(brand or '').strip()} {(title or '').strip()}".strip()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+# ── Build ─────────────────────────────────────────────────────────────────────
+def build_product_index(db_path: str | Path) -> int:
+    """
+    Embed `brand + title` for every product into a float16 matrix on disk.
+    Incremental: rows whose text is unchanged since the last build reuse their
+    stored vector, so only new or edited products are encoded.
+    Returns the number of products that had to be encoded.
+    """
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT rowid, title, brand FROM product ORDER BY rowid").fetchall()
+
+    rowids = [r[0] for r in rows]
+    texts = [_product_text(r[1], r[2]) for r in rows]
+    hashes = [_text_hash(t) for t in texts]
+
+    previous: dict[str, np.ndarray] = {}
+    if vectors_path.exists() and keys_path.exists():
+        old_keys = json.loads(keys_path.read_text())
+        old_matrix = np.load(vectors_path, mmap_mode="r")
+        previous = {h: old_matrix[i] for i, h in enumerate(old_keys["hashes"])}
+
+    todo = [i for i, h in enumerate(hashes) if h not in previous]
+    fresh = _encode([texts[i] for i in todo]) if todo else None
+
+    if fresh is not None:
+        dim = fresh.shape[1]
+    elif previous:
+        dim = next(iter(previous.values())).shape[0]
+    else:
+        dim = _encoder().get_sentence_embedding_dimension()
+    matrix = np.zeros((len(rows), dim), dtype=np.float16)
+    for i, h in enumerate(hashes):
+        if h in previous:
+            matrix[i] = previous[h]
+    for j, i in enumerate(todo):
+        matrix[i] = fresh[j]
+
+    # Write to temp files and swap in, so readers never see a half-written index
+    tmp_vectors = vectors_path.with_suffix(".tmp.npy")
+    tmp_keys = keys_path.with_suffix(".tmp.json")
+    np.save(tmp_vectors, matrix)
+    tmp_keys.write_text(json.dumps({"model": MODEL_NAME, "rowids": rowids, "hashes": hashes}))
+    os.replace(tmp_keys, keys_path)
+    os.replace(tmp_vectors, vectors_path)
+
+    print(f"Product index: {len(rows)} products, {len(todo)} newly embedded.")
+    return len(todo)
+
+
+# ── Search ────────────────────────────────────────────────────────────────────
+def _scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Dot products of the float16 rows with a float32 query. Rows are converted
+    a chunk at a time, so no float32 copy of the whole matrix is made.
+    """
+    scores = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), _SCORE_CHUNK):
+        block = matrix[start:start + _SCORE_CHUNK].astype(np.float32)
+        scores[start:start + _SCORE_CHUNK] = block @ query
+    return scores
+
+
+def _load_index() -> tuple[np.ndarray, np.ndarray] | None:
+    """Memory-map the index, reloading if the loader rebuilt it."""
+    if not vectors_path.exists() or not keys_path.exists():
+        return None
+    mtime = vectors_path.stat().st_mtime
+    if _cache["mtime"] != mtime:
+        matrix = np.load(vectors_path, mmap_mode="r")
+        rowids = np.asarray(json.loads(keys_path.read_text())["rowids"])
+        # A mismatch means we caught a rebuild between its two file swaps
+        if len(matrix) == len(rowids):
+            _cache.update(mtime=mtime, matrix=matrix, rowids=rowids)
+    if _cache["matrix"] is None:
+        return None
+    return _cache["matrix"], _cache["rowids"]
+
+
+_FILTER_COLUMNS = {
+    "min_price": "price >= ?",
+    "max_price": "price <= ?",
+    "min_rating": "avg_rating >= ?",
+    "min_discount": "discount >= ?",
+    "brands": "lower(trim(brand)) IN ({})",  # list of brand keys
+}
+
+
+def parse_filters(question: str) -> dict:
+    """Pull simple price / rating / discount constraints out of a question."""
+    q = question.lower().replace(",", "")
+    filters = {}
+    if m := re.search(r"(?:under|below|less than|within|upto|up to)\s*(?:rs\.?|₹)?\s*(\d+)", q):
+        filters["max_price"] = int(m.group(1))
+    if m := re.search(r"(?:above|over|more than)\s*(?:rs\.?|₹)\s*(\d+)", q):
+        filters["min_price"] = int(m.group(1))
+    if m := re.search(r"between\s*(?:rs\.?|₹)?\s*(\d+)\s*(?:and|to|-)\s*(?:rs\.?|₹)?\s*(\d+)", q):
+        filters["min_price"], filters["max_price"] = int(m.group(1)), int(m.group(2))
+    if m := re.search(r"rating\s*(?:of\s*)?(?:above|over|more than|at least|>=?)\s*(\d(?:\.\d)?)", q):
+        filters["min_rating"] = float(m.group(1))
+    if m := re.search(r"(\d{1,2})\s*%\s*(?:\+|or more\s*)?(?:discount|off)", q):
+        filters["min_discount"] = int(m.group(1)) / 100
+    return filters
+
+
+def search_products(
+    db_path: str | Path,
+    question: str,
+    filters: dict | None = None,
+    k: int = 5,
+    min_score: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Semantic top-k over product titles, restricted to rows matching `filters`
+    (keys from parse_filters, plus `brands`). Returns product rows ordered by similarity,
+    or an empty DataFrame if the index has not been built.
+    """
+    index = _load_index()
+    if index is None:
+        return pd.DataFrame()
+    matrix, rowids = index
+
+    query = _encode([question])[0].astype(np.float32)
+    scores = _scores(matrix, query)
+
+    if filters:
+        clauses, params = [], []
+        for key, value in filters.items():
+            if key not in _FILTER_COLUMNS:
+                continue
+            values = value if isinstance(value, list) else [value]
+            clauses.append(_FILTER_COLUMNS[key].format(",".join("?" * len(values))))
+            params += values
+        if clauses:
+            with sqlite3.connect(db_path) as conn:
+                allowed = [r[0] for r in conn.execute(
+                    f"SELECT rowid FROM product WHERE {' AND '.join(clauses)}", params
+                )]
+            scores = np.where(np.isin(rowids, allowed), scores, -np.inf)
+
+    candidates = np.flatnonzero(scores >= min_score)
+    if candidates.size == 0:
+        return pd.DataFrame()
+    k = min(k, candidates.size)
+    top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    top = top[np.argsort(-scores[top])]
+    top_rowids = [int(r) for r in rowids[top]]
+
+    placeholders = ",".join("?" * len(top_rowids))
+    with sqlite3.connect(db_path) as conn:
+        df = pd.read_sql_query(
+            f"SELECT rowid AS _rowid, * FROM product WHERE rowid IN ({placeholders})",
+            conn, params=top_rowids,
+        )
+    order = {r: i for i, r in enumerate(top_rowids)}
+    df = df.sort_values("_rowid", key=lambda s: s.map(order))
+    return df.drop(columns="_rowid").reset_index(drop=True)
@@ -0,0 +1,43 @@
+import sqlite3
+from urllib.parse import parse_qs, urlsplit
+
+# Scraped Flipkart links carry ~600 bytes of search tracking (otracker, iid,
+# ssid, ...). The product page only needs its path and the `pid` parameter.
+
+
+def product_id(url: str | None) -> str | None:
+    """Flipkart product id (`pid`) from a product link, or None."""
+    if not url:
+        return None
+    pid = parse_qs(urlsplit(url).query).get("pid")
+    return pid[0] if pid else None
+
+
+def canonical_link(url: str | None) -> str | None:
+    """
+    Short form of a product link: `https://www.flipkart.com/<slug>/p/<itm>?pid=<pid>`.
+    Links without a pid are returned unchanged.
+    """
+    pid = product_id(url)
+    if pid is None:
+        return url
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}?pid={pid}"
+
+
+def canonicalize_catalog(conn: sqlite3.Connection) -> int:
+    """
+    Add the `pid` column to an existing product table if missing, and rewrite
+    stored links to their canonical form. Returns the number of rows changed.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(product)")}
+    if "pid" not in columns:
+        conn.execute("ALTER TABLE product ADD COLUMN pid TEXT")
+
+    updates = []
+    for rowid, link, pid in conn.execute("SELECT rowid, product_link, pid FROM product"):
+        short = canonical_link(link)
+        if short != link or (pid is None and product_id(link)):
+            updates.append((short, product_id(link), rowid))
+    conn.executemany("UPDATE product SET product_link = ?, pid = ? WHERE rowid = ?", updates)
+    return len(updates)
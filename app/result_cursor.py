@@ -0,0 +1,134 @@
+import re
+import time
+
+PAGE_SIZE = 5
+CURSOR_TTL = 1800  # seconds; matches the API session TTL
+
+_PRODUCT_COLUMNS = {
+    "product_link", "title", "brand", "price", "discount", "avg_rating", "total_ratings", "pid",
+}
+
+_LIMIT = re.compile(r"\s+LIMIT\s+(\d+)\s*$", re.IGNORECASE)
+_ORDER_BY = re.compile(r"\s+ORDER\s+BY\s+(.+?)\s*$", re.IGNORECASE | re.DOTALL)
+_ORDER_TERM = re.compile(r"^(\w+)(?:\s+(ASC|DESC))?$", re.IGNORECASE)
+_SELECT_STAR = re.compile(r"^\s*SELECT\s+\*\s+FROM\s+product\b", re.IGNORECASE)
+
+# "more", "show me more", "next page", "5 more like these", ...
+_MORE_REQUEST = re.compile(
+    r"^\s*(?:please\s+)?(?:(?:show|give|get|load|list|see)\s+)?(?:me\s+)?"
+    r"(?:some\s+|a\s+few\s+|any\s+|\d+\s+)?(?:more|next|other)\b"
+    r"(?:\s+(?:ones?|results?|products?|options?|shoes|items?|page|please|"
+    r"like\s+(?:these|this|those|that)))*\s*[.!?]*\s*$",
+    re.IGNORECASE,
+)
+
+
+def is_more_request(query: str) -> bool:
+    """True for a bare follow-up asking for the next page of the last results."""
+    return bool(_MORE_REQUEST.match(query))
+
+
+class ResultCursor:
+    """
+    Pagination state for the last product query of a session.
+
+    Holds the validated query without its LIMIT. When the query is a plain
+    `SELECT * FROM product ...` with a simple ORDER BY, pages are fetched by
+    keyset (the last row's sort key plus rowid as tie-breaker), so later pages
+    cost the same as the first. Anything else falls back to OFFSET paging.
+    """
+
+    def __init__(self, base_query: str, order: list[tuple[str, str]] | None):
+        self.base_query = base_query
+        self.order = order            # [(column, "ASC"|"DESC"), ...] or None for OFFSET mode
+        self.last_key: tuple | None = None
+        self.offset = 0
+        self.exhausted = False
+        self.last_active = time.time()
+
+    @classmethod
+    def from_query(cls, query: str) -> tuple["ResultCursor", int] | None:
+        """
+        Build a cursor from an LLM query. Returns (cursor, first_page_size),
+        or None if the query has no trailing LIMIT to lift (e.g. OFFSET paging).
+        """
+        q = query.strip().rstrip(";").strip()
+        m = _LIMIT.search(q)
+        if not m:
+            return None
+        first_page = max(1, min(int(m.group(1)), PAGE_SIZE))
+        q = q[:m.start()]
+
+        if _SELECT_STAR.match(q):
+            order_match = _ORDER_BY.search(q)
+            terms = []
+            if order_match:
+                for term in order_match.group(1).split(","):
+                    t = _ORDER_TERM.match(term.strip())
+                    if not t or t.group(1).lower() not in _PRODUCT_COLUMNS:
+                        terms = None
+                        break
+                    terms.append((t.group(1), (t.group(2) or "ASC").upper()))
+            if terms is not None:
+                base = q[:order_match.start()] if order_match else q
+                base = _SELECT_STAR.sub("SELECT rowid AS _rowid, * FROM product", base, count=1)
+                return cls(base, terms + [("_rowid", "ASC")]), first_page
+
+        return cls(q, None), first_page
+
+    def page_query(self, size: int) -> tuple[str, list]:
+        """SQL and parameters for the next `size` rows."""
+        if self.order is None or (self.last_key is not None and None in self.last_key):
+            # OFFSET mode; also used when a sort key is NULL, which keyset can't compare
+            if self.order is None:
+                return f"SELECT * FROM ({self.base_query}) LIMIT ? OFFSET ?", [size, self.offset]
+            order_sql = ", ".join(f"{c} {d}" for c, d in self.order)
+            return (
+                f"SELECT * FROM ({self.base_query}) ORDER BY {order_sql} LIMIT ? OFFSET ?",
+                [size, self.offset],
+            )
+
+        order_sql = ", ".join(f"{c} {d}" for c, d in self.order)
+        if self.last_key is None:
+            return f"SELECT * FROM ({self.base_query}) ORDER BY {order_sql} LIMIT ?", [size]
+
+        # (a > x) OR (a = x AND b < y) OR ... — one branch per sort column
+        branches, params = [], []
+        for i, (col, direction) in enumerate(self.order):
+            parts = [f"{c} = ?" for c, _ in self.order[:i]]
+            parts.append(f"{col} {'>' if direction == 'ASC' else '<'} ?")
+            branches.append("(" + " AND ".join(parts) + ")")
+            params.extend(self.last_key[:i + 1])
+        return (
+            f"SELECT * FROM ({self.base_query}) WHERE {' OR '.join(branches)} "
+            f"ORDER BY {order_sql} LIMIT ?",
+            params + [size],
+        )
+
+    def advance(self, rows: list[dict], size: int) -> None:
+        """Record the position after a fetched page."""
+        self.offset += len(rows)
+        self.exhausted = len(rows) < size
+        self.last_active = time.time()
+        if rows and self.order is not None:
+            self.last_key = tuple(rows[-1][c] for c, _ in self.order)
+
+
+# ── Per-session store ─────────────────────────────────────────────────────────
+_CURSORS: dict[str, ResultCursor] = {}
+
+
+def save_cursor(session_id: str, cursor: ResultCursor | None) -> None:
+    """Remember (or with None, forget) the latest result cursor for a session."""
+    if cursor is None:
+        _CURSORS.pop(session_id, None)
+    else:
+        _CURSORS[session_id] = cursor
+
+
+def get_cursor(session_id: str) -> ResultCursor | None:
+    cursor = _CURSORS.get(session_id)
+    if cursor is not None and time.time() - cursor.last_active > CURSOR_TTL:
+        del _CURSORS[session_id]
+        return None
+    return cursor
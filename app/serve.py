@@ -0,0 +1,162 @@
+"""
+Preforking launcher for the API.
+
+Loads the sentence-transformers models and the semantic-router index once in
+this process, then forks the workers. Their model weights stay shared
+copy-on-write, instead of being loaded again in every worker as with
+`uvicorn --workers`. Each worker gets cpu_count // workers torch threads.
+
+    cd app
+    python serve.py --workers 4 --port 8000
+
+No database or ChromaDB connection is opened before the fork; each worker
+opens its own when it imports the API. FAQ ingestion and the catalog stats
+build run once, before the workers start; the workers only load the FAQ index.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)s | %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger("serve")
+
+
+def _limit_threads(threads: int) -> None:
+    """Thread counts for BLAS / OpenMP; read when torch first loads."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    # The tokenizers thread pool does not survive fork
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+
+def preload() -> None:
+    """Load the read-only model state the workers will share."""
+    import torch
+
+    # A single thread in the parent means no OpenMP pool is started before
+    # the fork; each worker starts its own when it sets its thread count.
+    torch.set_num_threads(1)
+
+    import product_index
+    import router  # encoder plus the encoded route utterances
+
+    # Loads the model into chromadb's per-name cache, which faq.py's embedding
+    # function reuses as well
+    product_index._encoder()
+
+    # Warm-up calls finish the lazy initialization before the fork
+    router.router("warm up")
+    product_index._encode(["warm up"])
+
+
+def setup() -> None:
+    """One-off startup work (FAQ ingestion, catalog stats), run before the workers exist."""
+    import api
+
+    api.startup()
+
+
+def _run_in_child(target, *args) -> int:
+    """Fork, run target(*args) in the child and return the child's pid."""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            target(*args)
+        except BaseException:
+            logger.exception("process %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _worker(config, sock, threads: int) -> None:
+    import torch
+    import uvicorn
+
+    torch.set_num_threads(threads)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API with preforked workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="torch threads per worker (default: cpu_count // workers)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    _limit_threads(threads)
+
+    import uvicorn
+
+    start = time.monotonic()
+    preload()
+    logger.info("serve | models preloaded in %.1fs", time.monotonic() - start)
+
+    # One-off setup runs in a child too, so the parent never opens the databases
+    _, status = os.waitpid(_run_in_child(setup), 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        sys.exit("serve | startup setup failed")
+    # Tells the workers' lifespan the setup has already run
+    os.environ["SERVE_PREFORKED"] = "1"
+
+    config = uvicorn.Config("api:app", host=args.host, port=args.port, log_level=args.log_level)
+    sock = config.bind_socket()
+
+    # Objects created so far are never freed; keep the garbage collector from
+    # touching (and so copying) their pages in the workers
+    gc.freeze()
+
+    workers: dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = _run_in_child(_worker, config, sock, threads)
+        workers[pid] = slot
+        logger.info("serve | worker %d started (pid %d, %d threads)", slot, pid, threads)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for slot in range(args.workers):
+        spawn(slot)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = workers.pop(pid, None)
+        if slot is not None and not stopping:
+            logger.warning(
+                "serve | worker %d (pid %d) exited with %d, restarting",
+                slot, pid, os.waitstatus_to_exitcode(status),
+            )
+            time.sleep(1)
+            spawn(slot)
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 import sqlite3
 import re
+import time
 import asyncio
 import pandas as pd
-from groq import AsyncGroq
 from pathlib import Path
+from typing import AsyncGenerator
+from catalog_stats import catalog_answer, find_brands
 from config import settings
+from llm import LLMUnavailableError, chat_completion, chat_completion_stream
+from product_index import parse_filters, search_products
+from result_cursor import PAGE_SIZE, ResultCursor, get_cursor, save_cursor
 
 GROQ_MODEL = settings.GROQ_MODEL
 db_path = Path(__file__).parent / "db.sqlite"
-client_sql = AsyncGroq(api_key=settings.GROQ_API_KEY)  # explicit key from config
 
 # ── Blocked SQL patterns (safety) ─────────────────────────────────────────────
 _BLOCKED = re.compile(
@@ -29,6 +33,7 @@ price - integer (price of the product in Indian Rupees)
 discount - float (discount on the product. 10 percent discount is represented as 0.1, 20 percent as 0.2, and such.)	
 avg_rating - float (average rating of the product. Range 0-5, 5 is the highest.)	
 total_ratings - integer (total number of ratings for the product)
+pid - string (Flipkart product id)
 
 </schema>
 Make sure whenever you try to search for the brand name, the name can be in any case. 
@@ -66,11 +71,95 @@ def validate_sql(query: str) -> None:
         raise ValueError(f"Query contains a blocked SQL keyword: {query[:80]}")
 
 
+# ── Query cost guard ──────────────────────────────────────────────────────────
+# Outcome counters, reported by /admin/stats
+sql_guard_stats = {"ok": 0, "truncated": 0, "rejected_plan": 0, "aborted_budget": 0}
+
+_PROGRESS_INTERVAL = 10_000  # VM instructions between progress-handler calls
+_TABLE_ROWS_TTL = 60         # seconds to cache table row counts
+_table_rows: dict = {"at": 0.0, "rows": {}}
+
+
+def _table_row_counts(conn: sqlite3.Connection) -> dict[str, int]:
+    if time.monotonic() - _table_rows["at"] > _TABLE_ROWS_TTL:
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        _table_rows["rows"] = {
+            t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables
+        }
+        _table_rows["at"] = time.monotonic()
+    return _table_rows["rows"]
+
+
+def estimate_scan_rows(conn: sqlite3.Connection, query: str, params: list) -> int:
+    """
+    Rough count of rows visited, from EXPLAIN QUERY PLAN, to catch join
+    blow-ups before they run. Full scans under the same parent are nested
+    loops (cross joins), so their table sizes multiply; separate loops add up.
+    A correlated subquery is counted once: its per-row repetition is bounded
+    by the time / VM-step budget instead, since it is usually cheap in practice.
+    Indexed SEARCH steps are treated as cheap.
+    """
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    counts = _table_row_counts(conn)
+    largest = max(counts.values(), default=0)
+
+    loops: dict[int, int] = {}
+    for _, parent, _, detail in plan:
+        if not detail.startswith("SCAN ") or detail.startswith("SCAN CONSTANT"):
+            continue
+        name = detail.split()[1]
+        if name.startswith("("):
+            continue  # scan of a materialized subquery, costed by its own loop
+        # Aliases ("SCAN p") can't be mapped back to a table; assume the largest
+        loops[parent] = loops.get(parent, 1) * counts.get(name, largest)
+    return sum(loops.values())
+
+
+def _budget_handler():
+    """Progress handler that aborts the statement past the time or VM-step budget."""
+    deadline = time.monotonic() + settings.SQL_TIME_BUDGET_MS / 1000
+    steps = 0
+
+    def handler() -> int:
+        nonlocal steps
+        steps += _PROGRESS_INTERVAL
+        return int(steps > settings.SQL_VM_STEP_BUDGET or time.monotonic() > deadline)
+
+    return handler
+
+
 # ── DB ────────────────────────────────────────────────────────────────────────
-def _run_query_sync(query: str) -> pd.DataFrame:
+def _run_query_sync(query: str, params: list | None = None) -> pd.DataFrame:
+    """
+    Run a validated SELECT under the cost guard: reject plans that would scan
+    more than SQL_MAX_SCAN_ROWS, abort past the time / VM-step budget, and
+    return at most SQL_MAX_ROWS rows. Rejections raise ValueError.
+    """
     validate_sql(query)
+    params = params or []
     with sqlite3.connect(db_path) as conn:
-        return pd.read_sql_query(query, conn)
+        estimate = estimate_scan_rows(conn, query, params)
+        if estimate > settings.SQL_MAX_SCAN_ROWS:
+            sql_guard_stats["rejected_plan"] += 1
+            raise ValueError(f"Query would scan ~{estimate:,} rows: {query[:80]}")
+
+        conn.set_progress_handler(_budget_handler(), _PROGRESS_INTERVAL)
+        try:
+            cur = conn.execute(query, params)
+            rows = cur.fetchmany(settings.SQL_MAX_ROWS + 1)
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            sql_guard_stats["aborted_budget"] += 1
+            raise ValueError(f"Query exceeded its execution budget: {query[:80]}") from e
+        columns = [d[0] for d in cur.description]
+
+    if len(rows) > settings.SQL_MAX_ROWS:
+        rows = rows[:settings.SQL_MAX_ROWS]
+        sql_guard_stats["truncated"] += 1
+    else:
+        sql_guard_stats["ok"] += 1
+    return pd.DataFrame.from_records(rows, columns=columns)
 
 
 async def run_query(query: str) -> pd.DataFrame:
@@ -78,20 +167,112 @@ async def run_query(query: str) -> pd.DataFrame:
     return await asyncio.to_thread(_run_query_sync, query)
 
 
+def _fetch_page_sync(cursor: ResultCursor, size: int) -> pd.DataFrame:
+    query, params = cursor.page_query(size)
+    df = _run_query_sync(query, params)
+    cursor.advance(df.to_dict(orient="records"), size)
+    return df.drop(columns="_rowid", errors="ignore")
+
+
+async def fetch_page(cursor: ResultCursor, size: int = PAGE_SIZE) -> pd.DataFrame:
+    """Fetch the next page of a result cursor in a thread (non-blocking)."""
+    return await asyncio.to_thread(_fetch_page_sync, cursor, size)
+
+
+async def sql_next_page(session_id: str) -> list | None:
+    """
+    Next page of the session's last product list, straight from SQLite.
+    None if the session has no cursor; [] once the results are exhausted.
+    """
+    cursor = get_cursor(session_id)
+    if cursor is None:
+        return None
+    if cursor.exhausted:
+        return []
+    df = await fetch_page(cursor)
+    return df.to_dict(orient="records")
+
+
+async def sql_catalog_answer(question: str) -> str | None:
+    """Answer aggregate catalog questions from the precomputed stats, without an LLM."""
+    if not settings.CATALOG_STATS_ANSWERS:
+        return None
+    return await asyncio.to_thread(catalog_answer, db_path, question)
+
+
+async def semantic_product_search(question: str, k: int = 5) -> pd.DataFrame:
+    """
+    Embedding search over product titles, filtered by any brand and price /
+    rating / discount constraints found in the question, so a named brand
+    with no matches finds nothing rather than other brands' products.
+    Empty if the index is missing.
+    """
+    def search() -> pd.DataFrame:
+        filters = parse_filters(question)
+        if brands := find_brands(db_path, question):
+            filters["brands"] = brands
+        return search_products(db_path, question, filters, k, settings.PRODUCT_SEARCH_MIN_SCORE)
+
+    return await asyncio.to_thread(search)
+
+
 # ── LLM calls ─────────────────────────────────────────────────────────────────
+_SQL_CLOSE = "</SQL>"
+
+
 async def generate_sql_query(question: str, history: list[dict] | None = None) -> str:
+    """
+    Stream the SQL generation and return as soon as the closing </SQL> tag
+    arrives. Any explanation the model adds after the tag is neither waited
+    for nor generated: the stream is closed and </SQL> is a stop sequence.
+    With LLM_HEDGE on, a hedged non-streaming call is made instead (the stop
+    sequence still ends it at the tag).
+    """
     messages = [{"role": "system", "content": sql_prompt}]
     if history:
         messages.extend(history[-10:])  # last 5 turns (10 messages)
     messages.append({"role": "user", "content": question})
-
-    completion = await client_sql.chat.completions.create(
+    kwargs = dict(
         messages=messages,
         model=GROQ_MODEL,
         temperature=0.2,
         max_tokens=1024,
+        stop=[_SQL_CLOSE],
     )
-    return completion.choices[0].message.content
+
+    if settings.LLM_HEDGE:
+        text = await chat_completion("sql_generation", **kwargs)
+    else:
+        text = await _stream_sql(kwargs)
+
+    # The stop sequence is not part of the returned text; restore the tag
+    if "<SQL>" in text and _SQL_CLOSE not in text:
+        text += _SQL_CLOSE
+    return text
+
+
+async def _stream_sql(kwargs: dict) -> str:
+    stream = chat_completion_stream("sql_generation", **kwargs)
+
+    async def read_until_close() -> str:
+        text = ""
+        async for chunk in stream:
+            text += chunk
+            if _SQL_CLOSE in text:
+                break
+        return text
+
+    # The route's deadline bounds the first token (retries included); the
+    # margin leaves room to finish the SQL after a late first token
+    deadline = settings.LLM_DEADLINES.get("sql_generation", settings.LLM_DEFAULT_DEADLINE)
+    try:
+        return await asyncio.wait_for(
+            read_until_close(), timeout=deadline + settings.SQL_GENERATION_MARGIN
+        )
+    except asyncio.TimeoutError as e:
+        raise LLMUnavailableError("SQL generation exceeded its deadline") from e
+    finally:
+        await stream.aclose()
 
 
 async def data_comprehension(
@@ -102,29 +283,88 @@ async def data_comprehension(
         messages.extend(history[-10:])
     messages.append({"role": "user", "content": f"Question: {question}\nData: {context}"})
 
-    completion = await client_sql.chat.completions.create(
+    return await chat_completion(
+        "sql_comprehension",
         messages=messages,
         model=GROQ_MODEL,
         temperature=0.2,
     )
-    return completion.choices[0].message.content
+
+
+async def data_comprehension_stream(
+    question: str, context: list, history: list[dict] | None = None
+) -> AsyncGenerator[str, None]:
+    """Streaming version of data_comprehension."""
+    messages = [{"role": "system", "content": comprehension_prompt}]
+    if history:
+        messages.extend(history[-10:])
+    messages.append({"role": "user", "content": f"Question: {question}\nData: {context}"})
+
+    async for content in chat_completion_stream(
+        "sql_comprehension",
+        messages=messages,
+        model=GROQ_MODEL,
+        temperature=0.2,
+    ):
+        yield content
 
 
 # ── Chain ─────────────────────────────────────────────────────────────────────
-async def sql_chain(question: str, history: list[dict] | None = None) -> str | list:
+_NO_DATA = "Sorry, we do not have the data to answer this question. Please ask another question."
+
+
+async def _fetch_result(
+    question: str, history: list[dict] | None = None, session_id: str | None = None
+) -> str | pd.DataFrame:
+    """
+    Generate and run the SQL; return the DataFrame, or a user-facing message on failure.
+    With a session_id, product lists are read through a ResultCursor that is kept
+    for "show more" follow-ups.
+    """
     sql_raw = await generate_sql_query(question, history)
     matches = re.findall(r"<SQL>(.*?)</SQL>", sql_raw, re.DOTALL)
 
     if not matches:
-        return "Sorry, we do not have the data to answer this question. Please ask another question."
+        return _NO_DATA
 
+    query = matches[0].strip()
+    cursor = None
     try:
-        df = await run_query(matches[0].strip())
-    except ValueError as e:
+        validate_sql(query)
+        built = ResultCursor.from_query(query) if session_id else None
+        df = None
+        if built is not None:
+            cursor, first_page = built
+            try:
+                df = await fetch_page(cursor, first_page)
+            except sqlite3.Error:
+                cursor = None  # rewritten query didn't run — use the original
+        if df is None:
+            df = await run_query(query)
+    except (ValueError, sqlite3.Error) as e:
         return f"Invalid query generated: {e}"
 
+    if session_id:
+        keep = cursor is not None and not df.empty and "product_link" in df.columns
+        save_cursor(session_id, cursor if keep else None)
+
+    if (df is None or df.empty) and settings.PRODUCT_SEMANTIC_SEARCH:
+        # Keyword guesses on `title` missed — retry as a semantic title search
+        df = await semantic_product_search(question)
+        if session_id:
+            save_cursor(session_id, None)
+
     if df is None or df.empty:
-        return "Sorry, we do not have the data to answer this question. Please ask another question."
+        return _NO_DATA
+    return df
+
+
+async def sql_chain(
+    question: str, history: list[dict] | None = None, session_id: str | None = None
+) -> str | list:
+    df = await _fetch_result(question, history, session_id)
+    if isinstance(df, str):
+        return df
 
     context = df.head(5).to_dict(orient="records")
 
@@ -134,6 +374,30 @@ async def sql_chain(question: str, history: list[dict] | None = None) -> str | l
     return await data_comprehension(question, context, history)
 
 
+async def sql_chain_stream(
+    question: str, history: list[dict] | None = None, session_id: str | None = None
+) -> AsyncGenerator[str | list, None]:
+    """
+    Streaming version of sql_chain.
+    Yields the product rows as a single list as soon as the query returns,
+    otherwise the comprehension answer as text chunks. Failure messages are
+    yielded as one string, exactly as sql_chain would return them.
+    """
+    df = await _fetch_result(question, history, session_id)
+    if isinstance(df, str):
+        yield df
+        return
+
+    context = df.head(5).to_dict(orient="records")
+
+    if "product_link" in df.columns:
+        yield context
+        return
+
+    async for chunk in data_comprehension_stream(question, context, history):
+        yield chunk
+
+
 if __name__ == "__main__":
     import asyncio
 
@@ -0,0 +1,81 @@
+import asyncio
+import json
+from typing import AsyncGenerator, AsyncIterator
+
+# ── Coalescing defaults ───────────────────────────────────────────────────────
+COALESCE_MAX_CHARS = 64     # flush once this many characters are buffered
+COALESCE_MAX_DELAY = 0.05   # ...or once the oldest buffered token is this old (s)
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+# ── Token coalescing ──────────────────────────────────────────────────────────
+async def coalesce(
+    chunks: AsyncIterator[str],
+    max_chars: int = COALESCE_MAX_CHARS,
+    max_delay: float = COALESCE_MAX_DELAY,
+) -> AsyncGenerator[str, None]:
+    """
+    Merge small token chunks into batches.
+    A batch is flushed when it reaches `max_chars`, when `max_delay` seconds
+    have passed since its first token, or when the source is exhausted.
+    """
+    it = chunks.__aiter__()
+    buffer: list[str] = []
+    size = 0
+    deadline = None
+    pending = None
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+
+            if not done:
+                # Time budget for the current batch ran out — flush what we have
+                yield "".join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            if not chunk:
+                continue
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= max_chars:
+                yield "".join(buffer)
+                buffer, size, deadline = [], 0, None
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def prepend(first, rest: AsyncIterator) -> AsyncGenerator:
+    """Re-attach an item already pulled off the front of an async iterator."""
+    yield first
+    async for item in rest:
+        yield item
+
+
+# ── Server-Sent Events ────────────────────────────────────────────────────────
+def sse_event(event: str, data: dict) -> str:
+    """Format one SSE frame. Payloads are JSON so newlines never break framing."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+def wants_sse(accept: str | None) -> bool:
+    """True if the client asked for Server-Sent Events via the Accept header."""
+    return bool(accept) and SSE_MEDIA_TYPE in accept.lower()
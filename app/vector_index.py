@@ -0,0 +1,49 @@
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Exact in-memory nearest-neighbour index over a normalized float32 matrix.
+
+    Top-k is a single matrix-vector product, which beats a round trip through
+    ChromaDB's persistence layer for small and medium collections. Results use
+    ChromaDB's query() shape and its squared-L2 distance (2 - 2 * cosine for
+    unit vectors), so callers and distance thresholds work with either backend.
+    """
+
+    def __init__(
+        self, ids: list[str], embeddings, documents: list[str], metadatas: list[dict]
+    ):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(documents):
+            raise ValueError("embeddings must be a 2-D array with one row per document")
+        self.matrix = _normalize(matrix)
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def query(self, embedding, n_results: int = 2) -> dict:
+        """Return the n_results nearest documents in ChromaDB's result format."""
+        vec = _normalize(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+        scores = self.matrix @ vec
+        k = min(n_results, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return {
+            "ids": [[self.ids[i] for i in top]],
+            "documents": [[self.documents[i] for i in top]],
+            "metadatas": [[self.metadatas[i] for i in top]],
+            "distances": [[float(2.0 - 2.0 * scores[i]) for i in top]],
+        }
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,197 @@
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat completions API.
+
+Serves POST /openai/v1/chat/completions with a configurable time-to-first-token
+and token rate so the API can be load-tested offline and deterministically.
+
+    python -m benchmarks.fake_groq --port 8001 --ttft-ms 250 --tokens-per-sec 400
+
+Then start the API against it:
+
+    GROQ_BASE_URL=http://127.0.0.1:8001 uvicorn api:app --port 8000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeLLMConfig:
+    ttft_ms: float = 250.0          # latency before the first token
+    tokens_per_sec: float = 400.0   # generation rate after the first token
+    completion_tokens: int = 60     # words emitted for free-text answers
+    jitter_ms: float = 0.0          # uniform +/- jitter added to ttft
+    error_rate: float = 0.0         # fraction of requests answered with a 503
+    sql_trailer_tokens: int = 40    # explanation words the model adds after </SQL>
+
+
+config = FakeLLMConfig()
+
+# Canned SQL answer so the SQL route exercises SQLite end to end
+_SQL_ANSWER = (
+    "<SQL>SELECT * FROM product WHERE brand LIKE '%puma%' "
+    "AND avg_rating > 4 ORDER BY avg_rating DESC LIMIT 5</SQL>"
+)
+
+_FILLER = (
+    "You can return most products within 30 days of delivery as long as they "
+    "are unused and in their original packaging. Refunds are processed to the "
+    "original payment method within 5 to 7 business days after the item is "
+    "picked up and passes the quality check."
+).split()
+
+
+_SQL_TRAILER = (
+    "This query filters the product table by brand and rating and returns "
+    "the five best rated matches first."
+).split()
+
+
+def _answer_tokens(messages: list[dict], stop: list[str] | None = None) -> list[str]:
+    """
+    Pick a plausible reply for the prompt and split it into word tokens.
+    Like the real API, generation ends before the first `stop` sequence.
+    """
+    system = messages[0].get("content", "") if messages else ""
+    if "<SQL>" in system:
+        words = _SQL_ANSWER.split(" ") + [
+            _SQL_TRAILER[i % len(_SQL_TRAILER)] for i in range(config.sql_trailer_tokens)
+        ]
+    else:
+        words = [_FILLER[i % len(_FILLER)] for i in range(config.completion_tokens)]
+    tokens = [w + " " for w in words]
+
+    text = "".join(tokens)
+    cuts = [text.find(s) for s in stop or [] if s in text]
+    if cuts:
+        cut, kept = min(cuts), []
+        for tok in tokens:
+            if cut <= 0:
+                break
+            kept.append(tok[:cut])
+            cut -= len(tok)
+        tokens = kept
+    return tokens
+
+
+def _ttft() -> float:
+    jitter = random.uniform(-config.jitter_ms, config.jitter_ms)
+    return max(0.0, config.ttft_ms + jitter) / 1000
+
+
+def _token_interval() -> float:
+    return 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+
+def _usage(messages: list[dict], tokens: list[str]) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(tokens),
+        "total_tokens": prompt_tokens + len(tokens),
+    }
+
+
+# ── App ───────────────────────────────────────────────────────────────────────
+app = FastAPI(title="Fake Groq", version="1.0.0")
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "fake-model")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if config.error_rate and random.random() < config.error_rate:
+        return JSONResponse(
+            status_code=503,
+            content={"error": {"message": "fake upstream overloaded", "type": "server_error"}},
+        )
+
+    stop = body.get("stop")
+    tokens = _answer_tokens(messages, [stop] if isinstance(stop, str) else stop)
+
+    if not body.get("stream"):
+        await asyncio.sleep(_ttft() + _token_interval() * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": _usage(messages, tokens),
+        }
+
+    def _chunk(delta: dict, finish_reason: str | None = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "delta": delta,
+                "finish_reason": finish_reason,
+                "logprobs": None,
+            }],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def generate():
+        await asyncio.sleep(_ttft())
+        yield _chunk({"role": "assistant", "content": ""})
+        interval = _token_interval()
+        for tok in tokens:
+            yield _chunk({"content": tok})
+            if interval:
+                await asyncio.sleep(interval)
+        yield _chunk({}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "config": config.__dict__}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake Groq server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=config.ttft_ms)
+    parser.add_argument("--tokens-per-sec", type=float, default=config.tokens_per_sec)
+    parser.add_argument("--completion-tokens", type=int, default=config.completion_tokens)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--sql-trailer-tokens", type=int, default=config.sql_trailer_tokens)
+    args = parser.parse_args()
+
+    config.ttft_ms = args.ttft_ms
+    config.tokens_per_sec = args.tokens_per_sec
+    config.completion_tokens = args.completion_tokens
+    config.jitter_ms = args.jitter_ms
+    config.error_rate = args.error_rate
+    config.sql_trailer_tokens = args.sql_trailer_tokens
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
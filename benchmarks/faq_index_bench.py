@@ -0,0 +1,92 @@
+"""
+Compare FAQ top-k search latency: ChromaDB query vs the in-memory NumPy index.
+
+Both backends get the same precomputed query embedding, so the numbers cover
+search only, not the sentence-transformers encode that precedes either.
+
+    python -m benchmarks.faq_index_bench --sizes 10 1000 10000 50000
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+from vector_index import VectorIndex  # noqa: E402
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def _unit_vectors(rng: np.random.Generator, n: int) -> np.ndarray:
+    m = rng.standard_normal((n, DIM)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def _time_ms(fn, queries: np.ndarray, warmup: int = 5) -> dict:
+    for q in queries[:warmup]:
+        fn(q)
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 4),
+    }
+
+
+def bench_size(n: int, n_queries: int, rng: np.random.Generator) -> dict:
+    ids = [f"id_{i}" for i in range(n)]
+    docs = [f"question {i}" for i in range(n)]
+    metas = [{"answer": f"answer {i}"} for i in range(n)]
+    embeddings = _unit_vectors(rng, n)
+    queries = _unit_vectors(rng, n_queries)
+
+    index = VectorIndex(ids, embeddings, docs, metas)
+    result = {"docs": n, "numpy": _time_ms(lambda q: index.query(q, n_results=2), queries)}
+
+    try:
+        import chromadb
+    except ImportError:
+        result["chromadb"] = "not installed"
+        return result
+
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"bench_{n}")
+    batch = 5000
+    for i in range(0, n, batch):
+        collection.add(
+            ids=ids[i:i + batch],
+            embeddings=embeddings[i:i + batch].tolist(),
+            documents=docs[i:i + batch],
+            metadatas=metas[i:i + batch],
+        )
+    result["chromadb"] = _time_ms(
+        lambda q: collection.query(query_embeddings=[q.tolist()], n_results=2), queries
+    )
+    result["speedup_p50"] = round(result["chromadb"]["p50_ms"] / result["numpy"]["p50_ms"], 1)
+    client.delete_collection(f"bench_{n}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark FAQ search backends.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = [bench_size(n, args.queries, rng) for n in args.sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Closed-loop load generator for /chat and /chat/stream.
+
+Runs a fixed number of concurrent virtual users, each with its own session,
+drawing queries from a weighted route mix. Reports latency percentiles,
+time-to-first-byte for streaming requests and overall requests/sec.
+
+    python -m benchmarks.load_test --concurrency 8 --requests 400 \\
+        --output benchmarks/results/latest.json \\
+        --compare benchmarks/results/baseline.json
+
+The API must run with RATE_LIMIT_ENABLED=false, otherwise the per-IP limit
+turns most of the run into 429s.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+# ── Workload ──────────────────────────────────────────────────────────────────
+QUERIES: dict[str, list[str]] = {
+    "faq": [
+        "What is the return policy of the products?",
+        "Do I get discount with HDFC credit card?",
+        "How can I track my order?",
+        "What payment methods are accepted?",
+        "How long does it take to process a refund?",
+    ],
+    "sql": [
+        "Give me Puma shoes with rating higher than 4.5",
+        "Are there any shoes under 3000",
+        "Show me top rated Nike running shoes",
+        "What is the average price of Campus shoes?",
+        "List women's walking shoes with more than 30% discount",
+    ],
+    "contextual": [
+        "Which one is the cheapest from the above?",
+        "Is this good for running?",
+        "Which one has the highest discount?",
+    ],
+    "out_of_scope": [
+        "Who won the cricket world cup?",
+        "Write me a poem about the sea",
+    ],
+}
+
+DEFAULT_MIX = {"faq": 0.4, "sql": 0.4, "contextual": 0.15, "out_of_scope": 0.05}
+
+
+def parse_mix(spec: str | None) -> dict[str, float]:
+    """Parse 'faq=0.5,sql=0.5' into normalized route weights."""
+    if not spec:
+        return DEFAULT_MIX
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in QUERIES:
+            raise ValueError(f"Unknown route in mix: {name!r}")
+        mix[name.strip()] = float(weight)
+    total = sum(mix.values())
+    return {k: v / total for k, v in mix.items()}
+
+
+# ── Stats ─────────────────────────────────────────────────────────────────────
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[k], 2)
+
+
+def summarize(samples: list[dict]) -> dict:
+    ok = [s for s in samples if s["ok"]]
+    latencies = [s["latency_ms"] for s in ok]
+    ttfts = [s["ttft_ms"] for s in ok if s.get("ttft_ms") is not None]
+    summary = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "latency_ms": {p: percentile(latencies, int(p[1:])) for p in ("p50", "p95", "p99")},
+    }
+    if ttfts:
+        summary["ttft_ms"] = {p: percentile(ttfts, int(p[1:])) for p in ("p50", "p95", "p99")}
+    return summary
+
+
+# ── Virtual user ──────────────────────────────────────────────────────────────
+async def _one_request(
+    client: httpx.AsyncClient, endpoint: str, query: str, session_id: str
+) -> dict:
+    payload = {"query": query, "session_id": session_id}
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if endpoint == "/chat/stream":
+            async with client.stream("POST", endpoint, json=payload) as r:
+                status = r.status_code
+                async for chunk in r.aiter_bytes():
+                    if chunk and ttft is None:
+                        ttft = (time.perf_counter() - start) * 1000
+        else:
+            r = await client.post(endpoint, json=payload)
+            status = r.status_code
+        ok = status == 200
+    except httpx.HTTPError:
+        status, ok = None, False
+    return {
+        "endpoint": endpoint,
+        "status": status,
+        "ok": ok,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "ttft_ms": ttft,
+    }
+
+
+async def _user(
+    client: httpx.AsyncClient,
+    queue: asyncio.Queue,
+    samples: list[dict],
+    stream_ratio: float,
+    rng: random.Random,
+) -> None:
+    session_id = f"bench-{uuid.uuid4().hex[:12]}"
+    while True:
+        try:
+            route = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        query = rng.choice(QUERIES[route])
+        endpoint = "/chat/stream" if rng.random() < stream_ratio else "/chat"
+        sample = await _one_request(client, endpoint, query, session_id)
+        sample["route"] = route
+        samples.append(sample)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    routes = rng.choices(list(mix), weights=list(mix.values()), k=args.requests)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for route in routes:
+        queue.put_nowait(route)
+
+    samples: list[dict] = []
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=args.base_url, timeout=args.timeout, limits=limits
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _user(client, queue, samples, args.stream_ratio, random.Random(rng.random()))
+            for _ in range(args.concurrency)
+        ))
+        wall = time.perf_counter() - start
+
+    by_endpoint = {
+        ep: summarize([s for s in samples if s["endpoint"] == ep])
+        for ep in ("/chat", "/chat/stream")
+    }
+    by_route = {
+        route: summarize([s for s in samples if s["route"] == route])
+        for route in mix
+    }
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "stream_ratio": args.stream_ratio,
+            "mix": mix,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "wall_seconds": round(wall, 3),
+        "requests_per_sec": round(len(samples) / wall, 2) if wall else None,
+        "overall": summarize(samples),
+        "endpoints": by_endpoint,
+        "routes": by_route,
+    }
+
+
+# ── Regression check ──────────────────────────────────────────────────────────
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return human-readable regressions beyond `tolerance` (0.2 = 20%)."""
+    regressions = []
+    for ep, stats in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(ep)
+        if not base:
+            continue
+        for metric in ("latency_ms", "ttft_ms"):
+            for pct in ("p50", "p95", "p99"):
+                now = stats.get(metric, {}).get(pct)
+                then = base.get(metric, {}).get(pct)
+                if now is not None and then and now > then * (1 + tolerance):
+                    regressions.append(f"{ep} {metric} {pct}: {then} -> {now}")
+    base_rps = baseline.get("requests_per_sec")
+    if base_rps and current["requests_per_sec"] < base_rps * (1 - tolerance):
+        regressions.append(f"requests_per_sec: {base_rps} -> {current['requests_per_sec']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the chat API.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--stream-ratio", type=float, default=0.5,
+                        help="Fraction of requests sent to /chat/stream.")
+    parser.add_argument("--mix", default=None,
+                        help="Route weights, e.g. 'faq=0.5,sql=0.3,contextual=0.2'.")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="Baseline JSON; exit non-zero on regression.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+    print(json.dumps(result, indent=2))
+
+    if args.compare:
+        regressions = compare(result, json.loads(args.compare.read_text()), args.tolerance)
+        if regressions:
+            print("\nPerformance regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  - {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%} of {args.compare}.")
+
+
+if __name__ == "__main__":
+    main()
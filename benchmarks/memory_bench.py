@@ -0,0 +1,184 @@
+"""
+Compare the API's memory footprint with 1 and N workers, started either by
+`uvicorn --workers` (each worker loads its own models) or by app/serve.py
+(models loaded once, workers forked and sharing them copy-on-write).
+
+    python -m benchmarks.memory_bench --workers 1 4 --output benchmarks/results/memory.json
+
+Reports RSS and PSS summed over the whole process tree. PSS splits shared
+pages between the processes mapping them, so it is the number that shows
+the copy-on-write saving; RSS counts shared pages once per process.
+Linux only (reads /proc). The API needs its usual environment
+(GROQ_API_KEY, GROQ_MODEL; GROQ_BASE_URL for the fake server).
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+LAUNCHERS = {
+    "uvicorn": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--workers", str(workers),
+    ],
+    "prefork": lambda port, workers: [
+        sys.executable, "serve.py", "--port", str(port), "--workers", str(workers),
+    ],
+}
+
+
+# ── /proc helpers ─────────────────────────────────────────────────────────────
+def _children(pid: int) -> list[int]:
+    kids = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            kids += [int(p) for p in (task / "children").read_text().split()]
+        except OSError:
+            pass
+    return kids
+
+
+def _tree(pid: int) -> list[int]:
+    pids, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        pids.append(p)
+        todo += _children(p)
+    return pids
+
+
+def _memory_kb(pid: int) -> dict[str, int]:
+    """Rss and Pss of one process, from smaps_rollup."""
+    fields = {}
+    try:
+        for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                fields[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return fields
+
+
+# ── Run ───────────────────────────────────────────────────────────────────────
+def _wait_ready(base_url: str, proc: subprocess.Popen, timeout: float) -> None:
+    """Wait until /health answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("server did not become healthy")
+
+
+def _sample(pid: int) -> tuple[list[int], list[dict]]:
+    pids = _tree(pid)
+    return pids, [_memory_kb(p) for p in pids]
+
+
+def _wait_stable(pid: int, settle: float, timeout: float) -> tuple[list[int], list[dict]]:
+    """
+    /health answers as soon as one worker is up; the others may still be
+    loading models. Sample until the tree's total PSS stops growing.
+    """
+    deadline = time.monotonic() + timeout
+    previous = 0
+    while True:
+        time.sleep(settle)
+        pids, per_process = _sample(pid)
+        total = sum(m.get("Pss", 0) for m in per_process)
+        if abs(total - previous) <= 0.01 * total or time.monotonic() > deadline:
+            return pids, per_process
+        previous = total
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    """Terminate the server and every worker in its session."""
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
+def measure(launcher: str, workers: int, port: int, settle: float, timeout: float) -> dict:
+    cmd = LAUNCHERS[launcher](port, workers)
+    proc = subprocess.Popen(
+        cmd, cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    start = time.monotonic()
+    try:
+        _wait_ready(f"http://127.0.0.1:{port}", proc, timeout)
+        startup_s = time.monotonic() - start
+        pids, per_process = _wait_stable(proc.pid, settle, timeout)
+    finally:
+        _stop(proc)
+
+    rss = sum(m.get("Rss", 0) for m in per_process) / 1024
+    pss = sum(m.get("Pss", 0) for m in per_process) / 1024
+    return {
+        "launcher": launcher,
+        "workers": workers,
+        "processes": len(pids),
+        "startup_s": round(startup_s, 1),
+        "rss_mb": round(rss, 1),
+        "pss_mb": round(pss, 1),
+        "pss_per_worker_mb": round(pss / workers, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure API memory per worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--launchers", nargs="+", choices=sorted(LAUNCHERS),
+                        default=["uvicorn", "prefork"])
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--settle", type=float, default=3.0,
+                        help="seconds between memory samples while workers finish loading")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    if not Path("/proc/self/smaps_rollup").exists():
+        sys.exit("memory_bench needs Linux /proc/<pid>/smaps_rollup")
+
+    runs = []
+    for launcher in args.launchers:
+        for workers in args.workers:
+            run = measure(launcher, workers, args.port, args.settle, args.timeout)
+            print(
+                f"{launcher:>8} x{workers}: PSS {run['pss_mb']:8.1f} MB "
+                f"({run['pss_per_worker_mb']:.1f}/worker), RSS {run['rss_mb']:8.1f} MB",
+                file=sys.stderr,
+            )
+            runs.append(run)
+
+    result = {
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count()},
+        "runs": runs,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import sqlite3
+
+import catalog_stats
+import pytest
+
+# brand, products, price, discount, avg_rating, ratings per product
+BRANDS = [
+    ("NIKE ", 6, 4000, 0.10, 4.5, 100),
+    ("PUMA", 7, 2000, 0.50, 3.5, 1000),
+    ("LI-NING", 5, 6000, 0.30, 4.0, 10),
+    ("RED TAPE", 5, 2500, 0.60, 3.0, 50),
+]
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("catalog") / "db.sqlite"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE product (title TEXT, brand TEXT, price INTEGER, "
+            "discount REAL, avg_rating REAL, total_ratings INTEGER)"
+        )
+        conn.executemany(
+            "INSERT INTO product VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (f"{brand.strip()} shoe {i}", brand, price + 100 * (2 * i - count + 1),
+                 discount, rating, ratings)
+                for brand, count, price, discount, rating, ratings in BRANDS
+                for i in range(count)
+            ],
+        )
+    catalog_stats.build_catalog_stats(path)
+    return path
+
+
+@pytest.mark.parametrize("question, expected", [
+    # Catalog-wide aggregates, even when "brands" is mentioned
+    ("What is the average rating across all brands?", "The average rating for products in our catalog is 3.8"),
+    ("average discount on all brands", "The average discount on products in our catalog is 37%"),
+    ("How many products do you have?", "We have 23 products in our catalog."),
+    # One brand
+    ("average price of Nike shoes", "The average price for NIKE products is Rs. 4,000"),
+    ("How many li-ning shoes?", "We have 5 LI-NING products."),
+    ("how many li ning shoes", "We have 5 LI-NING products."),
+    # Rankings
+    ("Which brand has the most products?", "PUMA has the most products"),
+    ("Which brand has the highest discount?", "RED TAPE has the highest average discount"),
+    ("highest-discount brand", "RED TAPE has the highest average discount"),
+    ("Which brand has the lowest discount?", "NIKE has the lowest average discount"),
+    ("Which brand has the least discount?", "NIKE has the lowest average discount"),
+    ("Which brand has the best rating?", "NIKE has the best average rating"),
+    ("top rated brands", "NIKE has the best average rating"),
+    ("Which brand has the lowest rating?", "RED TAPE has the lowest average rating"),
+    ("Which brand has the highest number of ratings?", "PUMA has the most ratings"),
+    ("Which brand has the highest total ratings?", "PUMA has the most ratings"),
+    ("Which brand has the most rated shoes?", "PUMA has the most ratings"),
+    ("Which brand is the cheapest?", "PUMA has the lowest prices"),
+    ("Which brand is the most expensive?", "LI-NING has the highest prices"),
+    # Left to text-to-SQL
+    ("Which brands do you sell?", None),
+    ("Which brand has the least rated shoes?", None),
+    ("Which brand has the highest number of discounts?", None),
+    ("average price of Nike and Puma shoes", None),
+    ("Nike running shoes under 3000", None),
+    ("average price of women's shoes", None),
+])
+def test_catalog_answer(db, question, expected):
+    answer = catalog_stats.catalog_answer(db, question)
+    if expected is None:
+        assert answer is None
+    else:
+        assert answer is not None and answer.startswith(expected)
+
+
+def test_find_brands(db):
+    assert catalog_stats.find_brands(db, "red tape or puma formal shoes") == ["red tape", "puma"]
+    assert catalog_stats.find_brands(db, "running shoes under 2000") == []
@@ -1,6 +1,7 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
 # Database and CSV file paths
 db_folder=os.path.join(os.path.dirname(__file__),'..','app')
 db_path =os.path.join(db_folder, 'db.sqlite')
@@ -8,6 +9,9 @@ db_path =os.path.join(db_folder, 'db.sqlite')
 os.makedirs(db_folder, exist_ok=True)
 csv_path = 'flipkart_product_data.csv'
 
+sys.path.insert(0, db_folder)
+from product_links import canonical_link, canonicalize_catalog, product_id
+
 # Connect to SQLite database (creates one if not exists)
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
@@ -21,20 +25,39 @@ CREATE TABLE IF NOT EXISTS product (
     price INTEGER,
     discount FLOAT,
     avg_rating FLOAT,
-    total_ratings INTEGER
+    total_ratings INTEGER,
+    pid TEXT
 );
 ''')
 
+# Databases loaded before links were canonicalized: add `pid`, shorten old links
+migrated = canonicalize_catalog(conn)
+
 # Commit the table creation
 conn.commit()
 
 # Read CSV file using pandas
 df = pd.read_csv(csv_path)
 
+# Store the short pid-based link and the product id instead of the tracking URL
+df['pid'] = df['product_link'].map(product_id)
+df['product_link'] = df['product_link'].map(canonical_link)
+
 # Insert data into the product table
 df.to_sql('product', conn, if_exists='append', index=False)
 
+# Reclaim the space freed by shortening existing links
+if migrated:
+    conn.execute('VACUUM')
+
 # Close the connection
 conn.close()
 
 print("Data inserted successfully!")
+
+# Refresh the semantic product index (only new or changed titles are embedded)
+# and the catalog aggregates (only brands whose products changed are recomputed)
+from product_index import build_product_index
+from catalog_stats import build_catalog_stats
+build_product_index(db_path)
+build_catalog_stats(db_path)